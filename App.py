@@ -1,16 +1,28 @@
-from flask import Flask, request, send_file, jsonify
+import startup  # First, to time loading the app
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import os
 from werkzeug.utils import secure_filename
 import pandas as pd
 import json
 import networkx as nx
-from pyvis.network import Network
-import threading
 import time
-import atexit
-from pdf_processor import process_pdf
-from file_handler import handle_file_upload #Import the upload logic
+from pdf_processor import process_pdf, PAGE_CACHE_FOLDER
+from file_handler import handle_file_upload, handle_batch_upload #Import the upload logic
+from job_handler import handle_job_status, handle_job_result, handle_job_profile
+from graph_handler import handle_graph_query, handle_flow_analytics, handle_graph_view
+from case_handler import handle_case_search, handle_account_component
+from job_queue import JobQueue, QueueFullError, DuplicateJobError, owner_alive
+from pipeline import run_pipeline
+from result_cache import evict as evict_cache, lookup as lookup_cached, resolve_download
+from exporters import EXPORT_FORMATS, ExportUnavailableError, resolve_export
+from graph_renderer import resolve_graph
+from downloads import send_artifact
+import metrics
+import checkpoints
+import graph_store
+
+startup.record('imports')
 
 app = Flask(__name__)
 # # Allow multiple domains
@@ -24,73 +36,214 @@ CORS(app, resources={r"/*": {"origins": allowed_origins}})
 # Folder paths for uploaded and processed files
 UPLOAD_FOLDER = 'uploads'  # Existing folder for uploaded files
 PROCESSED_FOLDER = 'processed'  # Existing folder for processed files
+JOBS_FOLDER = 'jobs'  # Status files of queued uploads
 
 # Ensure the folders exist (no need to create them since they already exist)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
+app.config['JOBS_FOLDER'] = JOBS_FOLDER
+app.config['PAGE_CACHE_FOLDER'] = PAGE_CACHE_FOLDER  # Tables of pages already extracted
+app.config['CHECKPOINT_FOLDER'] = checkpoints.CHECKPOINT_FOLDER  # Progress of unfinished uploads
+
+# Seconds a job extracts pages before it is suspended and queued again behind
+# newer uploads, so that one huge PDF does not hold a worker (0 for no limit)
+app.config['JOB_TIME_BUDGET'] = int(os.environ.get('JOB_TIME_BUDGET', 600))
+
+# Size limits: of one uploaded PDF, checked as its bytes are saved, and of a whole
+# request body, checked by the request parser
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('MAX_UPLOAD_BYTES', 256 * 1024 ** 2))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 1024 ** 3))
+
+# Downloads are content-addressed, so browsers may reuse them for this long before
+# revalidating with their ETag
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.environ.get('DOWNLOAD_MAX_AGE', 24 * 3600))
+
+# SQLite store linking the accounts of every processed case
+app.config['GRAPH_DB'] = os.environ.get('GRAPH_DB', 'graph_store.db')
+with startup.step('graph_store'):
+    graph_store.create_schema(app.config['GRAPH_DB'])
+
+# Per-process metrics files served together by /metrics
+app.config['METRICS_FOLDER'] = metrics.METRICS_FOLDER
+
+# Bounded pool of worker processes that run the PDF pipeline outside the request
+job_queue = JobQueue(
+    app.config['JOBS_FOLDER'],
+    max_workers=int(os.environ.get('JOB_WORKERS', 0)) or None,
+    max_pending=int(os.environ.get('JOB_QUEUE_LIMIT', 32)),
+)
+
+
+# Result cache bounds: entries unused for CACHE_MAX_AGE seconds are removed, then the
+# least recently used ones until the cache fits in CACHE_MAX_BYTES
+app.config['CACHE_MAX_BYTES'] = int(os.environ.get('CACHE_MAX_BYTES', 2 * 1024 ** 3))
+app.config['CACHE_MAX_AGE'] = int(os.environ.get('CACHE_MAX_AGE', 7 * 24 * 3600))
+
+# Seconds between cache cleanups
+app.config['CLEANUP_INTERVAL'] = int(os.environ.get('CLEANUP_INTERVAL', 3600))
+
+
+def remove_stale_files(folder, max_age):
+    # Leftover uploads of crashed jobs, old job status files and unused cached pages
+    if not os.path.isdir(folder):
+        return
+    now = time.time()
+    for file in os.listdir(folder):
+        file_path = os.path.join(folder, file)
+        if os.path.isfile(file_path) and now - os.path.getmtime(file_path) > max_age:
+            os.remove(file_path)
 
 
 def cleanup_files():
     try:
-        # Delete all files in the uploads folder
-        for file in os.listdir(app.config['UPLOAD_FOLDER']):
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], file)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-
-        # Delete all files in the processed folder
-        for file in os.listdir(app.config['PROCESSED_FOLDER']):
-            file_path = os.path.join(app.config['PROCESSED_FOLDER'], file)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-
-        print("Files cleaned up successfully.")
+        removed = evict_cache(app.config['PROCESSED_FOLDER'], app.config['CACHE_MAX_BYTES'], app.config['CACHE_MAX_AGE'])
+        remove_stale_files(app.config['UPLOAD_FOLDER'], app.config['CACHE_MAX_AGE'])
+        remove_stale_files(app.config['JOBS_FOLDER'], app.config['CACHE_MAX_AGE'])
+        if app.config['PAGE_CACHE_FOLDER']:
+            remove_stale_files(app.config['PAGE_CACHE_FOLDER'], app.config['CACHE_MAX_AGE'])
+        checkpoints.remove_stale(app.config['CHECKPOINT_FOLDER'], app.config['CACHE_MAX_AGE'])
+        # Pool processes exit without a hook of their own
+        metrics.remove_dead(app.config['METRICS_FOLDER'])
+        print(f"Cache cleanup removed {removed} entries.")
     except Exception as e:
         print(f"Error during file cleanup: {str(e)}")
+    resume_interrupted_jobs()
 
-# Periodic file cleanup function
-def periodic_cleanup():
-    while True:
-        time.sleep(3600)  # Run cleanup every hour
-        cleanup_files()
 
-# Register the cleanup function to run on server shutdown
-atexit.register(cleanup_files)
+def resume_interrupted_jobs():
+    """
+    Queues the jobs whose process died mid-way again under their job ids, to
+    continue from their checkpoints. Returns the number queued.
+    """
+    resumed = 0
+    try:
+        for checkpoint in checkpoints.interrupted(app.config['CHECKPOINT_FOLDER']):
+            job = checkpoint.load_job()
+            if owner_alive(app.config['JOBS_FOLDER'], job.get('owner')):
+                # Suspended and queued again by a live worker
+                checkpoint.release()
+                continue
+            if (not os.path.exists(checkpoint.source)
+                    or lookup_cached(app.config['PROCESSED_FOLDER'], checkpoint.digest) is not None):
+                checkpoint.remove()
+                continue
+            checkpoint.adopt(checkpoint.source, dict(job, owner=job_queue.owner))
+            checkpoint.release()
+            try:
+                job_queue.submit(run_pipeline, process_pdf, checkpoint.source, app.config['PROCESSED_FOLDER'],
+                                 checkpoint.digest, job['filename'], tuple(job['exports']), job['render_html'],
+                                 job['graph_db'], False, app.config['CHECKPOINT_FOLDER'],
+                                 app.config['JOB_TIME_BUDGET'], job_id=job['job_id'], key=checkpoint.digest)
+            except DuplicateJobError:
+                continue
+            except QueueFullError:
+                break
+            print(f"Resumed interrupted job {job['job_id']} of {job['filename']}")
+            resumed += 1
+    except Exception as e:
+        print(f"Error resuming interrupted jobs: {str(e)}")
+    return resumed
+
+
+def start_maintenance():
+    """
+    Starts the periodic cache cleanup, run by one process of the deployment.
+    Called by every worker after it is forked (see gunicorn.conf.py), never at
+    import, so that a preloading master starts no threads before forking. The
+    process taking over maintenance first resumes the jobs interrupted by a restart.
+    """
+    lock_path = os.path.join(app.config['JOBS_FOLDER'], 'maintenance.lock')
+    return startup.start_maintenance(lock_path, app.config['CLEANUP_INTERVAL'], cleanup_files,
+                                     on_start=resume_interrupted_jobs)
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
 
-# Start the cleanup thread when the app starts
-cleanup_thread = threading.Thread(target=periodic_cleanup, daemon=True)
-cleanup_thread.start()
+
+@app.after_request
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.observe('http_request_seconds', time.perf_counter() - start,
+                        endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code)
+        metrics.flush()
+    return response
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': f"Request body exceeds {app.config['MAX_CONTENT_LENGTH'] // 1024 ** 2} MiB"}), 413
 
 
 @app.route('/')
 def index():
     return '🚀 Flask server is running!'
 
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus text format, summed over every gunicorn worker and pool process
+    return metrics.render(app.config['METRICS_FOLDER']), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # Register the upload route using the imported function
-app.route('/upload', methods=['POST'])(handle_file_upload(app, process_pdf))
+app.route('/upload', methods=['POST'])(handle_file_upload(app, process_pdf, job_queue))
+app.route('/upload-batch', methods=['POST'])(handle_batch_upload(app, process_pdf, job_queue))
 
-@app.route('/download-excel', methods=['GET'])
-def download_excel():
+# Register the job status and result routes
+app.route('/jobs/<job_id>', methods=['GET'])(handle_job_status(job_queue))
+app.route('/jobs/<job_id>/result', methods=['GET'])(handle_job_result(job_queue))
+app.route('/jobs/<job_id>/profile', methods=['GET'])(handle_job_profile(job_queue))
+
+# Register the graph query route (layer range, neighbourhood, top flows, collapsed leaves)
+# the flow analytics route (inflow/outflow, money traced from the root account) and the
+# graph view route (transactions within a time window and amount range)
+app.route('/graph/<digest>', methods=['GET'])(handle_graph_query(app))
+app.route('/graph/<digest>/flows', methods=['GET'])(handle_flow_analytics(app))
+app.route('/graph-view/<digest>', methods=['GET'])(handle_graph_view(app))
+
+# Register the cross-case routes
+app.route('/cases', methods=['GET'])(handle_case_search(app))
+app.route('/accounts/<account>/component', methods=['GET'])(handle_account_component(app))
+
+def send_export(kind):
     filename = request.args.get('filename')
     if not filename:
         return jsonify({'error': 'Filename not provided'}), 400
 
-    excel_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-    if os.path.exists(excel_path):
-        return send_file(excel_path, as_attachment=True, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    return jsonify({'error': 'Excel file not found'}), 404
+    try:
+        export_path = resolve_export(app.config['PROCESSED_FOLDER'], filename, kind)
+    except ExportUnavailableError as e:
+        return jsonify({'error': str(e)}), 501
+    if export_path is not None:
+        return send_artifact(export_path, EXPORT_FORMATS[kind]['mimetype'], as_attachment=True)
+    return jsonify({'error': 'Export file not found'}), 404
+
+
+@app.route('/download-excel', methods=['GET'])
+def download_excel():
+    return send_export('excel')
 
 
 @app.route('/download-json', methods=['GET'])
 def download_json():
-    filename = request.args.get('filename')
-    if not filename:
-        return jsonify({'error': 'Filename not provided'}), 400
+    return send_export('json')
 
-    json_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-    if os.path.exists(json_path):
-        return send_file(json_path, as_attachment=True, mimetype='application/json')
-    return jsonify({'error': 'JSON file not found'}), 404
+
+@app.route('/download-csv', methods=['GET'])
+def download_csv():
+    return send_export('csv')
+
+
+@app.route('/download-parquet', methods=['GET'])
+def download_parquet():
+    return send_export('parquet')
+
+
+@app.route('/download-arrow', methods=['GET'])
+def download_arrow():
+    return send_export('arrow')
 
 
 @app.route('/download-graph', methods=['GET'])
@@ -99,11 +252,28 @@ def download_graph():
     if not filename:
         return jsonify({'error': 'Filename not provided'}), 400
 
-    graph_html_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-    if os.path.exists(graph_html_path):
-        return send_file(graph_html_path, as_attachment=False, mimetype='text/html')  # Set `as_attachment=False` to open in browser
+    graph_html_path = resolve_graph(app.config['PROCESSED_FOLDER'], filename)
+    if graph_html_path is not None:
+        return send_artifact(graph_html_path, 'text/html')  # Not an attachment, to open in browser
     return jsonify({'error': 'Graph HTML file not found'}), 404
 
+
+@app.route('/download-graph-data', methods=['GET'])
+def download_graph_data():
+    # Compact nodes/edges document for frontends that draw the graph themselves
+    filename = request.args.get('filename')
+    if not filename:
+        return jsonify({'error': 'Filename not provided'}), 400
+
+    graph_data_path = resolve_download(app.config['PROCESSED_FOLDER'], filename)
+    if graph_data_path is not None:
+        return send_artifact(graph_data_path, 'application/json')
+    return jsonify({'error': 'Graph data file not found'}), 404
+
+# Load everything a first upload would, once: in the gunicorn master when preloading
+startup.record('app')
+startup.warm_up()
+
 if __name__ == '__main__':
     # Create upload and processed folders if they don't exist
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
@@ -111,5 +281,7 @@ if __name__ == '__main__':
     if not os.path.exists(app.config['PROCESSED_FOLDER']):
         os.makedirs(app.config['PROCESSED_FOLDER'])
 
+    start_maintenance()
+    startup.report('App')
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
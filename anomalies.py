@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+
+# Flags a transaction may carry, in the order they are listed
+FLAGS = ('duplicate', 'split', 'burst')
+
+# Shorter UTR numbers ("0", "NA", "-") are placeholders, not identifiers
+MIN_UTR_LENGTH = 6
+
+# Transfers of the same amount from one account at most this far apart look
+# like one payment split into several
+SPLIT_WINDOW = pd.Timedelta(minutes=10)
+
+# An account sending at least BURST_MIN_TRANSFERS transfers within BURST_WINDOW fans money out
+BURST_WINDOW = pd.Timedelta(hours=1)
+BURST_MIN_TRANSFERS = 5
+
+# Label of every combination of flags, by bitmask (bit i is FLAGS[i])
+FLAG_LABELS = np.array(
+    [','.join(flag for bit, flag in enumerate(FLAGS) if mask >> bit & 1) or None
+     for mask in range(2 ** len(FLAGS))],
+    dtype=object)
+
+
+def duplicates(utr):
+    """
+    Transactions whose UTR number an earlier transaction already has: the same
+    transaction reported again on another layer or page. One hash lookup per row.
+    """
+    text = utr.astype('string').str.strip()
+    valid = (text.str.len() >= MIN_UTR_LENGTH).fillna(False).to_numpy(dtype=bool)
+    return valid & text.duplicated(keep='first').to_numpy(dtype=bool)
+
+
+def _in_group(mask, groups, periods):
+    # mask shifted by `periods` rows within each group, False where it leaves the group
+    return mask.groupby(groups, sort=False).shift(periods, fill_value=False).astype(bool)
+
+
+def timed_flags(parent, child, amount, date, skip):
+    """
+    Split payments and fan-out bursts, from one sort of the transfers by
+    (sender, timestamp, amount). Transfers to the sending account itself, without
+    a date, or in `skip` are never flagged. Returns two boolean arrays.
+    """
+    n = len(parent)
+    split = np.zeros(n, dtype=bool)
+    burst = np.zeros(n, dtype=bool)
+
+    senders = parent.cat.codes.to_numpy()
+    receivers = child.cat.codes.to_numpy()
+    eligible = (senders >= 0) & (senders != receivers) & date.notna().to_numpy() & ~skip
+    transfers = pd.DataFrame({
+        'parent': senders[eligible],
+        'date': date.to_numpy()[eligible],
+        'amount': amount.to_numpy()[eligible],
+        'row': np.flatnonzero(eligible),
+    }).sort_values(['parent', 'date', 'amount'], kind='stable', ignore_index=True)
+    if transfers.empty:
+        return split, burst
+
+    # Consecutive transfers of one amount by one sender, close in time
+    same_amount = transfers[transfers['amount'].notna()].groupby(['parent', 'amount'], sort=False)['date']
+    near = (same_amount.diff() <= SPLIT_WINDOW) | (same_amount.diff(-1).abs() <= SPLIT_WINDOW)
+    split[transfers.loc[near.index[near.to_numpy()], 'row'].to_numpy()] = True
+
+    # The BURST_MIN_TRANSFERS transfers from a row on all fall within the window
+    k = BURST_MIN_TRANSFERS
+    span = transfers.groupby('parent', sort=False)['date'].shift(-(k - 1)) - transfers['date']
+    starts = span <= BURST_WINDOW
+    in_burst = starts.copy()
+    for periods in range(1, k):
+        in_burst |= _in_group(starts, transfers['parent'], periods)
+    burst[transfers.loc[in_burst.to_numpy(), 'row'].to_numpy()] = True
+    return split, burst
+
+
+def flag_transactions(utr, parent, child, amount, date):
+    """
+    Flags of aligned transaction columns: 'duplicate' for UTR numbers seen
+    before, 'split' for same-amount transfers of one sender close in time and
+    'burst' for rapid fan-out from one sender, comma-separated. Unflagged
+    transactions have None. O(n log n) in the number of transactions.
+    """
+    duplicate = duplicates(utr)
+    split, burst = timed_flags(parent, child, amount, date, skip=duplicate)
+    masks = duplicate.astype(np.int64) | split.astype(np.int64) << 1 | burst.astype(np.int64) << 2
+    return pd.Series(FLAG_LABELS[masks], index=utr.index, dtype=object)
+
+
+def count_flags(flags):
+    """
+    Number of transactions carrying each flag.
+    """
+    counts = dict.fromkeys(FLAGS, 0)
+    for label, count in flags.value_counts().items():
+        for flag in label.split(','):
+            counts[flag] += int(count)
+    return counts
@@ -0,0 +1,192 @@
+import os
+import re
+import json
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Words that do not tell banks apart
+STOP_TOKENS = {'bank', 'of', 'the', 'and', 'ltd', 'limited', 'co'}
+
+# Words kept in names but too common to identify a bank on their own: a variant
+# made only of them ("bank of india" is just "india") must match a whole name,
+# or "Deutsche Bank India" would be Bank of India
+GENERIC_TOKENS = {'india', 'branch', 'payments'}
+
+# Company suffixes left out when a whole name is matched
+NAME_SUFFIXES = {'the', 'ltd', 'limited', 'co'}
+
+# Abbreviations and short forms seen in reports, by canonical name
+BANK_ALIASES = {
+    'State Bank of India': ['SBI'],
+    'Punjab National Bank': ['PNB'],
+    'Bank of Baroda': ['BOB'],
+    'Bank of India': ['BOI'],
+    'Central Bank of India': ['CBI'],
+    'Indian Overseas Bank': ['IOB'],
+    'Union Bank of India': ['UBI', 'Union Bank'],
+    'Bank of Maharashtra': ['Mahabank'],
+    'Punjab & Sind Bank': ['PSB'],
+    'Jammu and Kashmir Bank': ['J&K Bank', 'JK Bank'],
+    'Ratnakar Bank Limited': ['RBL', 'RBL Bank'],
+    'Catholic Syrian Bank Ltd.': ['CSB', 'CSB Bank'],
+    'IDFC FIRST Bank': ['IDFC', 'IDFC Bank'],
+    'Tamilnad Mercantile Bank Ltd.': ['TMB'],
+    'Karur Vysya Bank': ['KVB'],
+    'City Union Bank': ['CUB'],
+    'India Post Payments Bank': ['IPPB'],
+    'Google Pay': ['GPay'],
+    'Bharat Pe': ['BharatPe'],
+    'Amazon Pay': ['AmazonPay'],
+    'PhonePe': ['Phone Pe'],
+}
+
+# Names that share no whole word with a canonical name are matched on character
+# trigrams when they are at least this similar (Dice coefficient)
+FUZZY_MIN_SCORE = 0.7
+
+# Distinct raw names remembered per process
+RESOLVE_CACHE_SIZE = 4096
+
+
+def _words(name):
+    return re.sub(r'[^a-z0-9]+', ' ', str(name).lower().replace('&', ' and ')).split()
+
+
+def tokens(name):
+    """
+    The significant lowercase words of a bank name.
+    """
+    return tuple(token for token in _words(name) if token not in STOP_TOKENS)
+
+
+def whole_name(name):
+    """
+    A bank name as lowercase words, without company suffixes.
+    """
+    return ' '.join(word for word in _words(name) if word not in NAME_SUFFIXES)
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bank_id(name):
+    # Stable identifier of a canonical bank: its lowercase name as a slug
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+class BankIndex:
+    """
+    Resolves the bank names extracted from reports, which carry line breaks,
+    odd spacing, suffixes and abbreviations, to canonical banks. A name matches
+    the canonical name (or alias) whose words it contains, the longest first,
+    then the most similar one by character trigrams. Names made only of generic
+    words ("Bank of India") match whole names only. An IFSC prefix resolves rows
+    whose name matches nothing.
+    """
+    def __init__(self, banks, ifsc_prefixes, aliases=BANK_ALIASES, cache_size=RESOLVE_CACHE_SIZE):
+        # id -> {'name', 'icon'}
+        self.banks = {bank_id(name): {'name': name, 'icon': icon} for name, icon in banks.items()}
+        self.ifsc_prefixes = {prefix.upper(): bank_id(name) for prefix, name in ifsc_prefixes.items()}
+
+        # Every spelling of every bank as (bank id, words); indexed by word and by trigram.
+        # Spellings made only of generic words are matched on the whole name instead
+        self.variants = []
+        self.generic_names = {}
+        for name in banks:
+            for variant in [name] + aliases.get(name, []):
+                words = tokens(variant)
+                if words and set(words) <= GENERIC_TOKENS:
+                    self.generic_names[whole_name(variant)] = bank_id(name)
+                elif words:
+                    self.variants.append((bank_id(name), frozenset(words), ' '.join(words)))
+        self.token_index = {}
+        self.trigram_index = {}
+        for index, (_, words, key) in enumerate(self.variants):
+            for word in words:
+                self.token_index.setdefault(word, set()).add(index)
+            for trigram in _trigrams(key):
+                self.trigram_index.setdefault(trigram, set()).add(index)
+
+        self.resolve_name = lru_cache(maxsize=cache_size)(self._resolve_name)
+
+    @classmethod
+    def load(cls, banks_path, ifsc_path):
+        with open(banks_path, 'r') as f:
+            banks = json.load(f)
+        with open(ifsc_path, 'r') as f:
+            ifsc_prefixes = json.load(f)
+        return cls(banks, ifsc_prefixes)
+
+    def _resolve_name(self, name):
+        words = tokens(name)
+        if not words:
+            return None
+
+        generic = self.generic_names.get(whole_name(name))
+        if generic is not None or set(words) <= GENERIC_TOKENS:
+            # Nothing else in a name of generic words ("India") identifies a bank
+            return generic
+
+        # Variants whose every word appears in the name, the most specific first
+        # ("state bank of india" over "indian bank")
+        query = set(words)
+        candidates = set().union(*(self.token_index.get(word, ()) for word in query))
+        contained = [self.variants[index] for index in candidates if self.variants[index][1] <= query]
+        if contained:
+            return max(contained, key=lambda variant: (len(variant[1]), len(variant[2])))[0]
+
+        # Misspellings: the most similar variant by character trigrams
+        query_trigrams = _trigrams(' '.join(words))
+        counts = {}
+        for trigram in query_trigrams:
+            for index in self.trigram_index.get(trigram, ()):
+                counts[index] = counts.get(index, 0) + 1
+        best, best_score = None, FUZZY_MIN_SCORE
+        for index, shared in counts.items():
+            score = 2 * shared / (len(query_trigrams) + len(_trigrams(self.variants[index][2])))
+            if score >= best_score:
+                best, best_score = self.variants[index][0], score
+        return best
+
+    def resolve(self, name, ifsc=None):
+        """
+        Canonical bank id of a bank name, falling back to the IFSC code's bank
+        prefix. Returns None if neither is known.
+        """
+        resolved = self.resolve_name(name) if name else None
+        if resolved is None and ifsc:
+            resolved = self.ifsc_prefixes.get(str(ifsc)[:4].upper())
+        return resolved
+
+    def resolve_many(self, names, ifscs):
+        """
+        Canonical bank ids of aligned Series of names and IFSC codes, resolving
+        every distinct (name, IFSC prefix) pair once.
+        """
+        pairs = pd.DataFrame({
+            'name': names.astype(object).to_numpy(),
+            'prefix': ifscs.astype('string').str[:4].str.upper().astype(object).to_numpy(),
+        })
+        groups = pairs.groupby(['name', 'prefix'], dropna=False, sort=False).ngroup().to_numpy()
+        unique = pairs.drop_duplicates()
+        ids = np.array([
+            self.resolve(None if pd.isna(name) else name, None if pd.isna(prefix) else prefix)
+            for name, prefix in unique.itertuples(index=False)
+        ], dtype=object)
+        return pd.Series(ids[groups], index=names.index, dtype=object)
+
+    def icon(self, bank):
+        return self.banks[bank]['icon'] if bank in self.banks else None
+
+    def name(self, bank):
+        return self.banks[bank]['name'] if bank in self.banks else None
+
+
+# Loaded once per process
+BANK_INDEX = BankIndex.load(os.path.join(BASE_DIR, 'bank.json'), os.path.join(BASE_DIR, 'bank_ifsc.json'))
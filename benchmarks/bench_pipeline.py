@@ -0,0 +1,262 @@
+"""
+End-to-end benchmark of the upload pipeline on synthetic NCRP-style PDFs.
+
+Generates (or reuses) a synthetic report per size, uploads it through the Flask
+test client, waits for its job and reports throughput, latency percentiles and
+the duration and peak memory of every stage. Results are written as JSON; with
+--baseline the run fails when a stage got slower than the baseline by more than
+--threshold percent.
+
+    python benchmarks/bench_pipeline.py --rows 10,1000,10000 --output after.json
+    python benchmarks/bench_pipeline.py --rows 10,1000 --baseline before.json --threshold 15
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+from synthetic_pdf import write_synthetic_pdf, MAX_ROWS
+
+
+PERCENTILES = (50, 90, 99)
+
+# Sub-stages of process_pdf reported in its job stage record
+PDF_STAGES = {'open_seconds': 'pdf_open', 'extract_seconds': 'table_extraction', 'parse_seconds': 'column_parsing'}
+
+# Stages faster than this are not checked for regressions; their timings are mostly noise
+MIN_COMPARED_SECONDS = 0.05
+
+
+def percentile(values, p):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(values):
+    summary = {f"p{p}": round(percentile(values, p), 4) for p in PERCENTILES}
+    summary.update(mean=round(sum(values) / len(values), 4), min=round(min(values), 4), max=round(max(values), 4))
+    return summary
+
+
+def corpus_pdf(corpus, rows, rows_per_page, cover_pages, seed):
+    """
+    Path of the synthetic report of a size, generated on first use.
+    """
+    path = os.path.join(corpus, f"ncrp-{rows}r-{rows_per_page}pp-{cover_pages}c-s{seed}.pdf")
+    if not os.path.isfile(path):
+        start = time.perf_counter()
+        pages = write_synthetic_pdf(path, rows, rows_per_page, cover_pages, seed=seed)
+        print(f"Generated {path} ({pages} pages) in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def run_once(client, app, pdf_path, run_dir, form, poll_interval):
+    """
+    Uploads a PDF into an empty cache and waits for its job. Returns the upload
+    and end-to-end latencies and the finished job record.
+    """
+    # A fresh cache every time, otherwise repeats would be answered from the cache
+    app.config['PROCESSED_FOLDER'] = os.path.join(run_dir, 'processed')
+    app.config['GRAPH_DB'] = os.path.join(run_dir, 'graph_store.db')
+
+    start = time.perf_counter()
+    with open(pdf_path, 'rb') as f:
+        response = client.post('/upload', data={'file': (f, os.path.basename(pdf_path)), **form},
+                               content_type='multipart/form-data')
+    uploaded = time.perf_counter()
+    if response.status_code != 202:
+        raise RuntimeError(f"Upload failed with {response.status_code}: {response.get_json()}")
+
+    job_id = response.get_json()['job_id']
+    while True:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(poll_interval)
+    finished = time.perf_counter()
+    if job['status'] == 'failed':
+        raise RuntimeError(f"Job {job_id} failed: {job['error']}")
+    return uploaded - start, finished - start, job
+
+
+def stage_samples(job):
+    # (stage, seconds, peak RSS) of every stage of a finished job, process_pdf's parts included
+    samples = []
+    for name, stage in job['stages'].items():
+        samples.append((name, stage['seconds'], stage.get('peak_rss_bytes')))
+        for key, sub_stage in PDF_STAGES.items():
+            if name == 'process_pdf' and key in stage:
+                samples.append((sub_stage, stage[key], None))
+    return samples
+
+
+def bench_size(client, app, pdf_path, rows, work_dir, repeat, form, poll_interval):
+    upload_seconds, total_seconds, peaks, stages, pages = [], [], [], {}, None
+    for index in range(repeat):
+        upload, total, job = run_once(client, app, pdf_path, os.path.join(work_dir, f"{rows}-{index}"), form,
+                                      poll_interval)
+        upload_seconds.append(upload)
+        total_seconds.append(total)
+        peaks.append(job['peak_rss_bytes'])
+        pages = job['stages']['process_pdf'].get('pages')
+        for name, seconds, peak in stage_samples(job):
+            stage = stages.setdefault(name, {'seconds': [], 'peak_rss_bytes': []})
+            stage['seconds'].append(seconds)
+            if peak is not None:
+                stage['peak_rss_bytes'].append(peak)
+        print(f"  {rows} rows, run {index + 1}/{repeat}: {total:.2f}s")
+
+    median = percentile(total_seconds, 50)
+    return {
+        'rows': rows,
+        'pages': pages,
+        'pdf_bytes': os.path.getsize(pdf_path),
+        'repeat': repeat,
+        'latency': {'upload': summarize(upload_seconds), 'end_to_end': summarize(total_seconds)},
+        'throughput': {'rows_per_second': round(rows / median, 2), 'pages_per_second': round((pages or 0) / median, 2)},
+        'peak_rss_bytes': max(peaks),
+        'stages': {
+            name: {
+                'seconds': summarize(stage['seconds']),
+                'peak_rss_bytes': max(stage['peak_rss_bytes']) if stage['peak_rss_bytes'] else None,
+            }
+            for name, stage in stages.items()
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_seconds=MIN_COMPARED_SECONDS):
+    """
+    Returns a message for every stage (and the end-to-end latency) whose median
+    time grew by more than `threshold` percent over the baseline run of the same size.
+    """
+    baseline_sizes = {size['rows']: size for size in baseline['sizes']}
+    regressions = []
+    for size in results['sizes']:
+        before = baseline_sizes.get(size['rows'])
+        if before is None:
+            continue
+        timings = [('end_to_end', before['latency']['end_to_end'], size['latency']['end_to_end'])]
+        timings += [(name, before['stages'][name]['seconds'], stage['seconds'])
+                    for name, stage in size['stages'].items() if name in before['stages']]
+        for name, old, new in timings:
+            if max(old['p50'], new['p50']) < min_seconds:
+                continue
+            change = (new['p50'] - old['p50']) / old['p50'] * 100 if old['p50'] else math.inf
+            if change > threshold:
+                regressions.append(f"{size['rows']} rows, {name}: {old['p50']:.3f}s -> {new['p50']:.3f}s (+{change:.0f}%)")
+    return regressions
+
+
+def print_report(results):
+    for size in results['sizes']:
+        latency = size['latency']['end_to_end']
+        print(f"\n{size['rows']} rows, {size['pages']} pages: p50 {latency['p50']:.2f}s, p90 {latency['p90']:.2f}s, "
+              f"{size['throughput']['rows_per_second']} rows/s, peak RSS {size['peak_rss_bytes'] / 1024 ** 2:.0f} MiB")
+        for name, stage in size['stages'].items():
+            peak = stage['peak_rss_bytes']
+            peak = f"{peak / 1024 ** 2:7.0f} MiB" if peak else ''
+            print(f"  {name:<18} p50 {stage['seconds']['p50']:8.3f}s  p90 {stage['seconds']['p90']:8.3f}s  {peak}")
+
+
+def parse_sizes(value):
+    sizes = [int(size) for size in value.split(',')]
+    if any(not 10 <= size <= MAX_ROWS for size in sizes):
+        raise argparse.ArgumentTypeError(f"sizes must be between 10 and {MAX_ROWS} rows")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=parse_sizes, default=[10, 100, 1000],
+                        help='comma-separated report sizes in rows (10 to 50000)')
+    parser.add_argument('--rows-per-page', type=int, default=20)
+    parser.add_argument('--cover-pages', type=int, default=1, help='pages without tables before the report')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs of the smallest size first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--exports', default='json', help='export formats written while processing')
+    parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), 'fraudnet-bench-corpus'),
+                        help='folder the generated PDFs are kept in between runs')
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    parser.add_argument('--page-cache', action='store_true',
+                        help='keep the page table cache between runs, timing re-uploads instead of cold runs')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='percentage slowdown of a stage that fails the comparison')
+    args = parser.parse_args()
+
+    pdfs = {rows: corpus_pdf(args.corpus, rows, args.rows_per_page, args.cover_pages, args.seed) for rows in args.rows}
+
+    # The app keeps its uploads, jobs and metrics relative to the working directory
+    work_dir = tempfile.mkdtemp(prefix='fraudnet-bench-')
+    if not args.page_cache:
+        os.environ['PAGE_CACHE_FOLDER'] = ''
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        from App import app, job_queue
+        client = app.test_client()
+        form = {'exports': args.exports}
+        try:
+            for index in range(args.warmup):
+                run_once(client, app, pdfs[min(args.rows)], os.path.join(work_dir, f"warmup-{index}"), form,
+                         args.poll_interval)
+            sizes = [bench_size(client, app, pdfs[rows], rows, work_dir, args.repeat, form, args.poll_interval)
+                     for rows in args.rows]
+        finally:
+            job_queue.shutdown()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'created_at': time.time(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {key: getattr(args, key)
+                   for key in ('rows_per_page', 'cover_pages', 'repeat', 'seed', 'exports', 'page_cache')},
+        'sizes': sizes,
+    }
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:g}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo stage slower than the baseline by more than {args.threshold:g}%")
+
+
+if __name__ == '__main__':
+    main()
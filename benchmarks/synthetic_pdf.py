@@ -0,0 +1,76 @@
+"""
+Synthetic NCRP-style layer reports for benchmarks.
+
+Writes PDFs of layered money trails (victim account -> layer 1 -> layer 2 ...)
+whose transaction table has the header layout process_pdf detects, one table
+per page, optionally preceded by cover pages without tables.
+
+    python benchmarks/synthetic_pdf.py report.pdf --rows 1000 --rows-per-page 20
+"""
+import os
+import argparse
+from synthetic_rows import HEADERS, layered_rows
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, PageBreak
+except ImportError:  # Only needed to generate the corpus, see benchmarks/requirements.txt
+    SimpleDocTemplate = None
+
+
+MAX_ROWS = 50000
+
+
+def write_synthetic_pdf(path, rows, rows_per_page=20, cover_pages=1, layers=6, seed=0):
+    """
+    Writes a report of `rows` transactions, `rows_per_page` to a page, after
+    `cover_pages` pages of text. Returns the number of pages written.
+    """
+    if SimpleDocTemplate is None:
+        raise RuntimeError("reportlab is required to generate benchmark PDFs (pip install reportlab)")
+    if not 0 < rows <= MAX_ROWS:
+        raise ValueError(f"rows must be between 1 and {MAX_ROWS}")
+
+    styles = getSampleStyleSheet()
+    style = TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("FONTSIZE", (0, 0), (-1, -1), 5),
+        ("LEADING", (0, 0), (-1, -1), 6),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ])
+
+    story = []
+    for _ in range(cover_pages):
+        story += [Paragraph("Complaint acknowledgement and action taken report.", styles["Normal"]), PageBreak()]
+
+    body = list(layered_rows(rows, layers, seed))
+    for start in range(0, len(body), rows_per_page):
+        table = Table([HEADERS] + body[start:start + rows_per_page])
+        table.setStyle(style)
+        story += [table, PageBreak()]
+    story.pop()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    doc = SimpleDocTemplate(path, pagesize=landscape(A4), topMargin=20, bottomMargin=20, leftMargin=20, rightMargin=20)
+    doc.build(story)
+    return doc.page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--rows-per-page', type=int, default=20)
+    parser.add_argument('--cover-pages', type=int, default=1)
+    parser.add_argument('--layers', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pages = write_synthetic_pdf(args.path, args.rows, args.rows_per_page, args.cover_pages, args.layers, args.seed)
+    print(f"Wrote {args.rows} rows on {pages} pages to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
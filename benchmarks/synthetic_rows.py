@@ -0,0 +1,99 @@
+"""
+Synthetic NCRP-style layer report rows shared by the benchmarks.
+
+Generates the cells of the transaction table of layered money trails (victim
+account -> layer 1 -> layer 2 ...), under the header layout process_pdf detects:
+written to PDFs by synthetic_pdf.py and parsed directly by bench_parse_columns.py.
+"""
+import random
+
+
+HEADERS = [
+    "S. No.", "Account No./ (Wallet /PG/PA) Id", "Action Taken By bank", "Bank/ (Wallet /PG/PA)",
+    "Account Details", "Transaction Details", "Branch Location", "Branch Manager",
+    "Reference No.", "ATM ID / Place / Location", "Action Taken By / Date of Action",
+]
+BANKS = [
+    ("State Bank Of India\nLtd", "SBIN"), ("HDFC Bank", "HDFC"), ("ICICI Bank\nLimited", "ICIC"),
+    ("Axis Bank\nMG Road", "UTIB"), ("Punjab National\nBank", "PUNB"), ("Kotak Mahindra Bank\nLtd", "KKBK"),
+]
+STATUSES = ["Money Transfer to", "Cash Withdrawal through Cheque", "Transaction put on hold", "Withdrawal through ATM"]
+
+VICTIM_ACCOUNT = "10000000001"
+
+
+def _account(rnd):
+    return str(rnd.randint(10 ** 10, 10 ** 11 - 1))
+
+
+def _irregular(rnd, row, parent, child, status, txn_date, utr, amount, layer):
+    # Other layouts of the same cells in extracted tables: accounts wrapped at
+    # any digit, dates without "Txn", details on one line, and missing cells
+    split = rnd.randint(1, len(parent))
+    row[1] = rnd.choice([
+        row[1],
+        f"{parent[:split]}\n{parent[split:]}\n{utr} Layer : {layer}",
+        f"{parent}\nUPI/{rnd.randint(10 ** 5, 10 ** 9)}\n{utr}\nLayer : {layer}",
+        parent,
+        None,
+    ])
+    row[2] = rnd.choice([
+        row[2],
+        f"{status} Date: {txn_date}",
+        f"{status} Cheque No: {rnd.randint(1000, 999999)}\nTxn Date: {txn_date}",
+        status,
+    ])
+    row[3] = rnd.choice([row[3], "Punjab National\nBank\nDelhi", None])
+    row[4] = rnd.choice([
+        row[4],
+        f"A/c No.- {child}\nHDFC000{rnd.randint(1000, 9999)}",
+        "A/c No.-",
+        None,
+    ])
+    row[5] = rnd.choice([
+        row[5],
+        f"Transaction ID / UTR\nNumber-: {utr[3:]} Transaction Amount-: {amount}.{rnd.randint(0, 99)}",
+        "Transaction Details not available",
+    ])
+
+
+def layered_rows(rows, layers=6, seed=0, irregular=False):
+    """
+    Generates the table rows of a layered money trail: every layer's transactions
+    start from accounts that received money in the layer before it. With
+    `irregular`, cells also take the other layouts pdfplumber extracts from
+    real reports, including missing ones.
+    """
+    rnd = random.Random(seed)
+    receivers = {0: [VICTIM_ACCOUNT]}
+    for i in range(rows):
+        # Rows are spread evenly over the layers, in layer order
+        layer = 1 + i * layers // rows
+        parent = rnd.choice(receivers.get(layer - 1) or receivers[0])
+        child = _account(rnd)
+        receivers.setdefault(layer, []).append(child)
+
+        bank, ifsc_prefix = rnd.choice(BANKS)
+        status = rnd.choice(STATUSES)
+        txn_date = f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2024 " \
+                   f"{rnd.randint(1, 12)}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d} {rnd.choice(['AM', 'PM'])}"
+        action = f"{status}\nTxn Date: {txn_date}"
+        if "Cheque" in status:
+            action += f"\nCheque No: {rnd.randint(100000, 999999)}"
+        amount = rnd.randint(100, 200000)
+        disputed = rnd.randint(amount // 2, amount)
+        utr = f"UTR{rnd.randint(10 ** 11, 10 ** 12 - 1)}"
+
+        row = [
+            str(i + 1),
+            f"{parent[:6]}\n{parent[6:]}\n{utr} Layer : {layer}",
+            action,
+            bank,
+            f"A/c No.- {child}\nIFSC Code: {ifsc_prefix}0{rnd.randint(100000, 999999)}\nReported {rnd.randint(1, 5)} times",
+            f"Transaction ID / UTR Number-: {utr}\nTransaction Amount-: {amount}\nDisputed Amount: {disputed}",
+            "Branch", "Nodal Officer", f"REF{rnd.randint(10 ** 6, 10 ** 7)}", "Delhi",
+            f"Bank / {rnd.randint(1, 28):02d}/02/2024",
+        ]
+        if irregular:
+            _irregular(rnd, row, parent, child, status, txn_date, utr, amount, layer)
+        yield row
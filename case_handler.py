@@ -0,0 +1,42 @@
+from flask import request, jsonify
+import graph_store
+
+# Upper bound of the accounts a component request may ask for
+MAX_COMPONENT_ACCOUNTS = 10000
+
+
+def handle_case_search(app):
+    """
+    Lists the processed cases that touch an account, an IFSC branch or a UTR number.
+    """
+    def case_search():
+        account = request.args.get('account') or None
+        ifsc = request.args.get('ifsc') or None
+        utr = request.args.get('utr') or None
+        if account is None and ifsc is None and utr is None:
+            return jsonify({'error': 'Provide an account, ifsc or utr'}), 400
+
+        cases = graph_store.find_cases(app.config['GRAPH_DB'], account=account, ifsc=ifsc, utr=utr)
+        return jsonify({'cases': cases}), 200
+
+    return case_search
+
+
+def handle_account_component(app):
+    """
+    Returns the accounts and transactions connected to an account across all processed cases.
+    """
+    def account_component(account):
+        try:
+            max_accounts = int(request.args.get('max_accounts', 1000))
+        except ValueError:
+            return jsonify({'error': 'Invalid value for max_accounts'}), 400
+        if not 0 < max_accounts <= MAX_COMPONENT_ACCOUNTS:
+            return jsonify({'error': f'max_accounts must be between 1 and {MAX_COMPONENT_ACCOUNTS}'}), 400
+
+        component = graph_store.connected_component(app.config['GRAPH_DB'], account, max_accounts)
+        if component is None:
+            return jsonify({'error': 'Account not found'}), 404
+        return jsonify(component), 200
+
+    return account_component
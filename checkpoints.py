@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+from job_queue import JobSuspended, ACTIVE_STATUSES, owner_alive, read_job
+
+try:
+    import fcntl
+except ImportError:  # No file locks (Windows): interrupted jobs are not resumed automatically
+    fcntl = None
+
+
+# Extracted page tables of unfinished jobs, by PDF digest, so that a job that was
+# interrupted or ran out of time continues from its last completed chunk
+CHECKPOINT_FOLDER = os.environ.get('CHECKPOINT_FOLDER', 'checkpoints')
+
+# Pages extracted and persisted together
+CHECKPOINT_PAGES = int(os.environ.get('CHECKPOINT_PAGES', 50))
+
+SOURCE_NAME = 'source.pdf'
+JOB_NAME = 'job.json'
+LOCK_NAME = 'lock'
+CHUNK_PATTERN = re.compile(r'pages-(\d+)-(\d+)\.json')
+
+
+class CheckpointBusyError(Exception):
+    """Raised when another process is already working on a checkpoint."""
+
+
+class TimeBudgetExceeded(JobSuspended):
+    """Raised when a job runs out of time; its checkpoint lets the next run continue."""
+
+
+class Checkpoint:
+    """
+    Spill store of one PDF being processed: the uploaded PDF, the options of the
+    job processing it, and the tables of its pages in chunks of `chunk_pages`
+    pages, each written once extracted. The process working on it holds an
+    exclusive lock, which the operating system releases if the process dies.
+    """
+    def __init__(self, folder, digest, chunk_pages=CHECKPOINT_PAGES):
+        self.path = os.path.join(folder, digest)
+        self.digest = digest
+        self.chunk_pages = chunk_pages
+        self._lock = None
+
+    def acquire(self, wait=False):
+        """
+        Locks the checkpoint for this process, creating it if needed. Raises
+        CheckpointBusyError if another process holds it, unless `wait` is set,
+        in which case it blocks until that process releases or removes it.
+        """
+        lock_path = os.path.join(self.path, LOCK_NAME)
+        while True:
+            os.makedirs(self.path, exist_ok=True)
+            lock = open(lock_path, 'a')
+            if fcntl is None:
+                break
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                raise CheckpointBusyError(f"PDF {self.digest} is already being processed")
+            # The holder may have removed the checkpoint while this process waited
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock.close()
+        self._lock = lock
+        # Chunks keep the size they were started with
+        job = self.load_job()
+        if job is not None:
+            self.chunk_pages = job.get('chunk_pages', self.chunk_pages)
+
+    def busy(self):
+        """
+        Whether another process holds the checkpoint, without creating it.
+        """
+        if fcntl is None or self._lock is not None:
+            return False
+        try:
+            lock = open(os.path.join(self.path, LOCK_NAME), 'r')
+        except FileNotFoundError:
+            return False
+        with lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError:
+                return True
+        return False
+
+    def release(self):
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    @property
+    def source(self):
+        return os.path.join(self.path, SOURCE_NAME)
+
+    def adopt(self, filepath, job):
+        """
+        Moves the upload into the checkpoint, out of reach of the uploads cleanup,
+        and records the options needed to run its job again. Returns the PDF's path.
+        """
+        if os.path.exists(filepath) and os.path.abspath(filepath) != os.path.abspath(self.source):
+            os.replace(filepath, self.source)
+        self._write_json(JOB_NAME, dict(job, chunk_pages=self.chunk_pages))
+        return self.source
+
+    @property
+    def filename(self):
+        # Name of the uploaded PDF, which is stored as SOURCE_NAME
+        job = self.load_job()
+        return job.get('filename') if job is not None else None
+
+    def load_job(self):
+        try:
+            with open(os.path.join(self.path, JOB_NAME), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def ranges(self, page_count):
+        return [(start, min(start + self.chunk_pages, page_count)) for start in range(0, page_count, self.chunk_pages)]
+
+    def completed(self):
+        """
+        The (start, stop) page ranges already extracted.
+        """
+        done = set()
+        for name in os.listdir(self.path):
+            match = CHUNK_PATTERN.fullmatch(name)
+            if match:
+                done.add((int(match.group(1)), int(match.group(2))))
+        return done
+
+    def _chunk_name(self, start, stop):
+        return f"pages-{start:06d}-{stop:06d}.json"
+
+    def write_chunk(self, start, stop, page_tables, stats):
+        """
+        Persists the tables of pages [start, stop) and the extraction counts of the range.
+        """
+        self._write_json(self._chunk_name(start, stop), {'tables': page_tables, 'stats': stats})
+
+    def read_chunk(self, start, stop):
+        with open(os.path.join(self.path, self._chunk_name(start, stop)), 'r') as f:
+            chunk = json.load(f)
+        return chunk['tables'], chunk['stats']
+
+    def iter_pages(self, page_count):
+        """
+        Yields the tables of every page, in page order, one chunk in memory at a time.
+        """
+        for start, stop in self.ranges(page_count):
+            page_tables, _ = self.read_chunk(start, stop)
+            yield from page_tables
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.path, name)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def remove(self):
+        self.release()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def active_job(folder, jobs_folder, digest):
+    """
+    Id of the unfinished job of any process that is processing the PDF of
+    `digest`, running or queued again after a suspension, or None.
+    """
+    checkpoint = Checkpoint(folder, digest)
+    job = checkpoint.load_job()
+    if job is None:
+        return None
+    if not checkpoint.busy() and not owner_alive(jobs_folder, job.get('owner')):
+        return None
+    status = read_job(jobs_folder, job['job_id'])
+    return job['job_id'] if status is not None and status['status'] in ACTIVE_STATUSES else None
+
+
+def interrupted(folder):
+    """
+    Yields the checkpoints of `folder` with a recorded job that no process is
+    working on, locked by this process: jobs that were interrupted, or that are
+    queued to run again (see job_queue.owner_alive).
+    """
+    if fcntl is None or not os.path.isdir(folder):
+        return
+    for digest in os.listdir(folder):
+        checkpoint = Checkpoint(folder, digest)
+        if not os.path.isfile(os.path.join(checkpoint.path, JOB_NAME)):
+            continue
+        try:
+            checkpoint.acquire()
+        except CheckpointBusyError:
+            continue
+        yield checkpoint
+
+
+def remove_stale(folder, max_age):
+    """
+    Removes the unlocked checkpoints not written to for `max_age` seconds.
+    Returns the number removed.
+    """
+    if not os.path.isdir(folder):
+        return 0
+    removed = 0
+    now = time.time()
+    for digest in os.listdir(folder):
+        checkpoint = Checkpoint(folder, digest)
+        if not os.path.isdir(checkpoint.path) or now - os.path.getmtime(checkpoint.path) <= max_age:
+            continue
+        try:
+            checkpoint.acquire()
+        except CheckpointBusyError:
+            continue
+        checkpoint.remove()
+        removed += 1
+    return removed
@@ -0,0 +1,121 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+
+# Raw transaction dates as extracted from the report, and their parsed timestamps
+DATE_COLUMN = 'Transaction Date'
+TIMESTAMP_COLUMN = 'Transaction Timestamp'
+
+# Formats of the transaction dates in NCRP reports and bank statements, tried
+# in order on the dates the earlier ones did not parse
+DATE_FORMATS = (
+    '%d/%m/%Y %I:%M:%S %p',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %I:%M %p',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%d/%m/%y %I:%M:%S %p',
+    '%d/%m/%y %H:%M:%S',
+    '%d/%m/%y',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+)
+
+# The date and time at the start of an extracted value; the date pattern also
+# captures stray "A", "P" and "M" letters of the text that follows
+DATE_PATTERN = re.compile(
+    r'(\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4})(?:\s*(\d{1,2}:\d{2}(?::\d{2})?)(?:\s*([AP])\.?\s*M\b\.?)?)?',
+    re.IGNORECASE)
+
+# Distinct raw dates remembered per process, across cases
+PARSE_CACHE_SIZE = 100000
+
+_parsed = {}
+_parsed_lock = threading.Lock()
+
+
+def normalize(values):
+    """
+    Rewrites raw dates as "<date> <time> <AM|PM>" with single spaces, "/" as
+    separator and uppercase markers. Values without a date are <NA>.
+    """
+    parts = values.astype('string').str.extract(DATE_PATTERN)
+    day = parts[0].str.replace(r'[.-]', '/', regex=True)
+    time = (' ' + parts[1]).fillna('')
+    marker = (' ' + parts[2].str.upper() + 'M').fillna('')
+    return day + time + marker
+
+
+def _parse_unique(texts, stats):
+    # Parses distinct normalized dates, each format tried on what is still unparsed
+    dates = pd.Series(pd.NaT, index=texts.index, dtype='datetime64[ns]')
+    missing = texts.notna()
+    for date_format in DATE_FORMATS:
+        if not missing.any():
+            break
+        parsed = pd.to_datetime(texts[missing], format=date_format, errors='coerce')
+        stats['parsed'][date_format] = stats['parsed'].get(date_format, 0) + int(parsed.notna().sum())
+        stats['failed'][date_format] = stats['failed'].get(date_format, 0) + int(parsed.isna().sum())
+        dates[missing] = parsed
+        missing = missing & dates.isna()
+    return dates
+
+
+def parse_dates(values, stats=None):
+    """
+    Parses raw report dates to a datetime64 Series; dates in none of the formats
+    are NaT. Every distinct value is parsed once, and values parsed before by
+    this process are not parsed again. If `stats` is given, records how many
+    distinct values each format parsed and failed on, how many were taken from
+    the cache, and how many rows could not be parsed.
+    """
+    stats = {} if stats is None else stats
+    stats.setdefault('parsed', {})
+    stats.setdefault('failed', {})
+
+    codes, uniques = pd.factorize(values.astype('string'), use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype='string')
+    with _parsed_lock:
+        cached = [_parsed.get(value) for value in uniques]
+    known = pd.Series([value is not None for value in cached], dtype=bool)
+
+    dates = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    hits = pd.Series([value for value in cached if value is not None], dtype=object)
+    dates[known] = pd.to_datetime(hits).to_numpy()
+    new = ~known
+    if new.any():
+        dates[new] = _parse_unique(normalize(uniques[new]), stats)
+        with _parsed_lock:
+            if len(_parsed) + int(new.sum()) > PARSE_CACHE_SIZE:
+                _parsed.clear()
+            _parsed.update(zip(uniques[new], dates[new]))
+
+    # Missing values have code -1, which picks the NaT appended last
+    lookup = np.append(dates.to_numpy(), np.datetime64('NaT', 'ns'))
+    result = pd.Series(lookup[codes], index=values.index, dtype='datetime64[ns]')
+    stats['distinct'] = stats.get('distinct', 0) + len(uniques)
+    stats['cached'] = stats.get('cached', 0) + int(known.sum())
+    stats['unparsed'] = stats.get('unparsed', 0) + int((result.isna() & values.notna()).sum())
+    return result
+
+
+def with_timestamps(df, stats=None):
+    """
+    Returns the records with a TIMESTAMP_COLUMN of their parsed transaction
+    dates. Timestamps the records already have are kept and only the missing
+    ones are parsed, e.g. for the fresh records of a batch merged with cached ones.
+    """
+    if DATE_COLUMN in df.columns:
+        values = df[DATE_COLUMN]
+    else:
+        values = pd.Series(None, index=df.index, dtype=object)
+    if TIMESTAMP_COLUMN not in df.columns:
+        return df.assign(**{TIMESTAMP_COLUMN: parse_dates(values, stats)})
+
+    timestamps = pd.to_datetime(df[TIMESTAMP_COLUMN], errors='coerce').astype('datetime64[ns]')
+    missing = timestamps.isna() & values.notna()
+    if missing.any():
+        timestamps[missing] = parse_dates(values[missing], stats)
+    return df.assign(**{TIMESTAMP_COLUMN: timestamps})
@@ -0,0 +1,94 @@
+import os
+import gzip
+import uuid
+import shutil
+from flask import request, send_file
+from result_cache import CHUNK_SIZE
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are optional, gzip is always available
+    brotli = None
+
+
+# Text artifacts worth compressing; spreadsheets, Parquet and Arrow files are
+# binary or compressed already
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/csv'}
+
+# Smaller files are sent as they are
+MIN_COMPRESS_BYTES = 1024
+
+# Variants are written once per artifact, so favour size over speed
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+def _write_gzip(src, dst):
+    # mtime=0 keeps the output, and so the variant's ETag, independent of when it was written
+    with open(src, 'rb') as fin, open(dst, 'wb') as raw, \
+            gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0) as fout:
+        shutil.copyfileobj(fin, fout, CHUNK_SIZE)
+
+
+def _write_brotli(src, dst):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        while True:
+            chunk = fin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            fout.write(compressor.process(chunk))
+        fout.write(compressor.finish())
+
+
+# Content-Encoding: (file suffix, writer), in order of preference
+ENCODINGS = {
+    'br': ('.br', _write_brotli),
+    'gzip': ('.gz', _write_gzip),
+}
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def precompressed(path, encoding):
+    """
+    Returns the path of the `encoding` variant of an artifact, compressing it
+    next to the artifact on first request.
+    """
+    suffix, write = ENCODINGS[encoding]
+    variant = path + suffix
+    if os.path.isfile(variant):
+        return variant
+
+    # Concurrent requests each write their own file; the last rename wins with identical bytes
+    tmp_path = f"{variant}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(path, tmp_path)
+        os.replace(tmp_path, variant)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return variant
+
+
+def send_artifact(path, mimetype, as_attachment=False):
+    """
+    Sends a cached artifact with an ETag, conditional GET and Range support, as
+    the precompressed variant of the best encoding the client accepts.
+    """
+    name = os.path.basename(path)
+    compressible = mimetype in COMPRESSIBLE_MIMETYPES and os.path.getsize(path) >= MIN_COMPRESS_BYTES
+
+    encoding = request.accept_encodings.best_match(available_encodings()) if compressible else None
+    if encoding is not None:
+        path = precompressed(path, encoding)
+
+    response = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=name)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,119 @@
+import os
+import uuid
+import numpy as np
+import pandas as pd
+
+
+# File of the edge index in a cache entry
+EDGE_INDEX_NAME = 'edge_index.npz'
+
+
+def _nanoseconds(timestamp):
+    # Bounds beyond the nanosecond range lie before or after every transaction;
+    # np.datetime64 would silently wrap them around
+    if timestamp < pd.Timestamp.min:
+        return np.iinfo(np.int64).min
+    if timestamp > pd.Timestamp.max:
+        return np.iinfo(np.int64).max
+    return np.datetime64(timestamp, 'ns').astype(np.int64)
+
+
+class EdgeIndex:
+    """
+    Sorted indexes of a case's transactions (the rows of its transaction
+    table) on timestamp and on amount. A range of either is two binary searches
+    away; rows without a timestamp or amount are left out of that index.
+    """
+    def __init__(self, dates, date_rows, amounts, amount_rows, count):
+        self.dates = dates            # int64 nanoseconds, ascending
+        self.date_rows = date_rows    # row of each entry of dates
+        self.amounts = amounts        # float64, ascending
+        self.amount_rows = amount_rows
+        self.count = count            # rows of the table
+
+    @classmethod
+    def build(cls, table):
+        dates = table['date']
+        has_date = np.flatnonzero(dates.notna().to_numpy())
+        date_values = dates.to_numpy('datetime64[ns]').view('int64')[has_date]
+        date_order = np.argsort(date_values, kind='stable')
+
+        amounts = table['amount'].to_numpy('float64')
+        has_amount = np.flatnonzero(~np.isnan(amounts))
+        amount_order = np.argsort(amounts[has_amount], kind='stable')
+
+        return cls(date_values[date_order], has_date[date_order],
+                   amounts[has_amount][amount_order], has_amount[amount_order], len(table))
+
+    def write(self, folder):
+        path = os.path.join(folder, EDGE_INDEX_NAME)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(tmp_path, dates=self.dates, date_rows=self.date_rows, amounts=self.amounts,
+                 amount_rows=self.amount_rows, count=np.int64(self.count))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, folder):
+        """
+        Loads the edge index of a cache entry. Raises FileNotFoundError for
+        entries written before it existed.
+        """
+        with np.load(os.path.join(folder, EDGE_INDEX_NAME)) as arrays:
+            return cls(arrays['dates'], arrays['date_rows'], arrays['amounts'], arrays['amount_rows'],
+                       int(arrays['count']))
+
+    def date_range(self, start=None, end=None):
+        """
+        Rows dated within [start, end] (pandas Timestamps), earliest first.
+        """
+        lo = 0 if start is None else np.searchsorted(self.dates, _nanoseconds(start), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, _nanoseconds(end), side='right')
+        return self.date_rows[lo:hi]
+
+    def amount_range(self, min_amount=None, max_amount=None):
+        """
+        Rows whose amount is within [min_amount, max_amount], smallest first.
+        """
+        lo = 0 if min_amount is None else np.searchsorted(self.amounts, min_amount, side='left')
+        hi = len(self.amounts) if max_amount is None else np.searchsorted(self.amounts, max_amount, side='right')
+        return self.amount_rows[lo:hi]
+
+    def first_date(self):
+        return int(self.dates[0]) if len(self.dates) else None
+
+    def select(self, start=None, end=None, min_amount=None, max_amount=None, limit=None):
+        """
+        Rows matching every given bound, in table order. Only the `limit` largest
+        amounts are kept when more match. Returns the rows and the number that matched.
+        """
+        ranges = []
+        if start is not None or end is not None:
+            ranges.append(self.date_range(start, end))
+        if min_amount is not None or max_amount is not None:
+            ranges.append(self.amount_range(min_amount, max_amount))
+
+        if not ranges:
+            rows = np.arange(self.count)
+        else:
+            # Rows of the narrowest range that are in the others too
+            ranges.sort(key=len)
+            keep = np.zeros(self.count, dtype=bool)
+            keep[ranges[0]] = True
+            for other in ranges[1:]:
+                mask = np.zeros(self.count, dtype=bool)
+                mask[other] = True
+                keep &= mask
+            rows = np.flatnonzero(keep)
+
+        matched = len(rows)
+        if limit is not None and matched > limit:
+            # The amount index lists rows by amount, so its tail is the largest matches
+            keep = np.zeros(self.count, dtype=bool)
+            keep[rows] = True
+            largest = self.amount_rows[keep[self.amount_rows]][::-1][:limit]
+            if len(largest) < limit:
+                # Then the matches without an amount
+                unranked = np.setdiff1d(rows, self.amount_rows, assume_unique=True)
+                largest = np.concatenate([largest, unranked[:limit - len(largest)]])
+            rows = np.sort(largest)
+        return rows, matched
@@ -0,0 +1,138 @@
+import os
+import uuid
+import pandas as pd
+from openpyxl import Workbook
+from werkzeug.security import safe_join
+import metrics
+from result_cache import read_manifest, resolve_download
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet and Arrow exports are optional
+    pa = None
+
+
+SNAPSHOT_NAME = 'records.pkl'
+
+# Rows written per chunk by the streaming writers
+EXPORT_CHUNK_ROWS = 5000
+
+
+class ExportUnavailableError(Exception):
+    """Raised when an export format needs an optional dependency that is not installed."""
+
+
+def _chunks(df):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+
+def _write_excel(df, path):
+    # Write-only workbooks stream rows to disk instead of keeping every cell in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append([str(column) for column in df.columns])
+    for chunk in _chunks(df):
+        chunk = chunk.astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def _write_json(df, path):
+    df.to_json(path, orient='index', force_ascii=False, date_format='iso')
+
+
+def _write_csv(df, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for number, chunk in enumerate(_chunks(df)):
+            chunk.to_csv(f, header=number == 0, index=False)
+
+
+def _arrow_batches(df):
+    if pa is None:
+        raise ExportUnavailableError('pyarrow is required for Parquet and Arrow exports')
+    # One schema for the whole frame, so chunks with only empty cells keep their column types
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    return schema, (pa.Table.from_pandas(chunk, schema=schema, preserve_index=False) for chunk in _chunks(df))
+
+
+def _write_parquet(df, path):
+    schema, tables = _arrow_batches(df)
+    with pa.parquet.ParquetWriter(path, schema) as writer:
+        for table in tables:
+            writer.write_table(table)
+
+
+def _write_arrow(df, path):
+    schema, tables = _arrow_batches(df)
+    with pa.ipc.new_file(path, schema) as writer:
+        for table in tables:
+            writer.write_table(table)
+
+
+# Export formats by manifest artifact key
+EXPORT_FORMATS = {
+    'excel': {
+        'suffix': '.xlsx',
+        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'writer': _write_excel,
+    },
+    'json': {'suffix': '.json', 'mimetype': 'application/json', 'writer': _write_json},
+    'csv': {'suffix': '.csv', 'mimetype': 'text/csv', 'writer': _write_csv},
+    'parquet': {'suffix': '.parquet', 'mimetype': 'application/vnd.apache.parquet', 'writer': _write_parquet},
+    'arrow': {'suffix': '.arrow', 'mimetype': 'application/vnd.apache.arrow.file', 'writer': _write_arrow},
+}
+
+
+def export_names(stem):
+    return {kind: stem + export['suffix'] for kind, export in EXPORT_FORMATS.items()}
+
+
+def write_snapshot(df, folder):
+    """
+    Stores the processed DataFrame so that exports can be produced later on demand.
+    """
+    df.to_pickle(os.path.join(folder, SNAPSHOT_NAME))
+
+
+def load_snapshot(folder):
+    return pd.read_pickle(os.path.join(folder, SNAPSHOT_NAME))
+
+
+def write_export(df, path, kind):
+    # Written under a temporary name, so concurrent requests never serve a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        EXPORT_FORMATS[kind]['writer'](df, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def resolve_export(processed_folder, filename, kind):
+    """
+    Returns the path of an export of a cache entry, producing it from the entry's
+    snapshot on first request. Returns None if the entry or artifact does not exist.
+    """
+    path = resolve_download(processed_folder, filename)
+    if path is not None:
+        return path
+
+    path = safe_join(processed_folder, filename)
+    if path is None:
+        return None
+    entry_dir, name = os.path.split(path)
+    manifest = read_manifest(entry_dir)
+    if manifest is None or manifest['artifacts'].get(kind) != name:
+        return None
+    if not os.path.isfile(os.path.join(entry_dir, SNAPSHOT_NAME)):
+        return None
+
+    with metrics.timed('pipeline_stage_seconds', stage=kind):
+        write_export(load_snapshot(entry_dir), path, kind)
+    return resolve_download(processed_folder, filename)
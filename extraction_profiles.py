@@ -0,0 +1,147 @@
+import re
+
+
+class ProfileError(Exception):
+    """Raised when an extraction profile spec is invalid."""
+
+
+# Column roles the parser reads. A role maps to a header position (int) or a
+# header name (str); positional roles must exist, named ones are optional.
+COLUMN_ROLES = ('account', 'status', 'bank', 'account_details', 'transaction_details')
+
+# Field patterns the parser runs, with the number of groups each must capture
+PATTERN_GROUPS = {
+    'bank_name_keywords': 0,
+    'before_date': 2,
+    'cheque_no': 1,
+    'txn_date': 2,
+    'digits': 0,
+    'layer': 1,
+    'before_ifsc': 1,
+    'ifsc': 1,
+    'reported_count': 1,
+    'transaction_id': 1,
+    'transaction_amount': 1,
+    'disputed_amount': 1,
+}
+
+# NCRP (National Cybercrime Reporting Portal) action-taken report
+NCRP_PROFILE = {
+    'name': 'ncrp',
+    # A table is this layout's transaction table when its first row matches enough keywords
+    'header_keywords': [
+        "s. no.", "account no.", "action taken", "bank", "account details",
+        "transaction details", "branch", "manager", "reference no.", "atm id",
+        "place", "location", "action taken by", "date of action"
+    ],
+    'min_keyword_matches': 8,
+    'columns': {
+        'account': 1,
+        'status': 2,
+        'bank': 3,
+        'account_details': "Account Details",
+        'transaction_details': "Transaction Details",
+    },
+    'patterns': {
+        'bank_name_keywords': r'bank|ltd|limited',
+        'before_date': r'(?is)^(?:(.*?)Txn Date:|(.*?)Date:)',
+        'cheque_no': r'(?i)Cheque\s*No\s*[:\-]?\s*(\d+)',
+        'txn_date': r'(?s)^(?:.*?Txn Date:\s*([\d:/\sAPMapm]+)|.*?Date:\s*([\d:/\sAPMapm]+))',
+        'digits': r'\d+',
+        'layer': r'Layer : (\d+)',
+        'before_ifsc': r'(?is)^(.*?)\bifsc\b',
+        'ifsc': r'(\b[A-Z]{4}\d[A-Z0-9]{6}\b)',
+        'reported_count': r'Reported (\d+) times',
+        'transaction_id': r'Transaction ID / UTR\s+Number-:\s*([A-Z]*\d+)',
+        'transaction_amount': r'Transaction Amount-:\s*(\d+(?:\.\d+)?)',
+        'disputed_amount': r'Disputed Amount:\s*(\d+(?:\.\d+)?)',
+    },
+}
+
+# Specs of every supported layout, most specific first
+PROFILE_SPECS = [NCRP_PROFILE]
+
+
+class Profile:
+    """
+    A compiled extraction profile: the header fingerprint of one report layout,
+    where its columns are, and the precompiled patterns of its fields.
+    """
+    def __init__(self, spec):
+        try:
+            self.name = spec['name']
+            self.header_keywords = [keyword.lower() for keyword in spec['header_keywords']]
+            self.min_keyword_matches = int(spec['min_keyword_matches'])
+            columns = spec['columns']
+            patterns = spec['patterns']
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProfileError(f"Invalid extraction profile {spec.get('name')!r}: {e}")
+
+        missing = [role for role in COLUMN_ROLES if role not in columns]
+        if missing:
+            raise ProfileError(f"Profile {self.name!r} does not map the columns {', '.join(missing)}")
+        if any(not isinstance(columns[role], (int, str)) for role in COLUMN_ROLES):
+            raise ProfileError(f"Profile {self.name!r} maps a column to something other than a position or header")
+        self.columns = {role: columns[role] for role in COLUMN_ROLES}
+
+        self.patterns = {}
+        for field, groups in PATTERN_GROUPS.items():
+            if field not in patterns:
+                raise ProfileError(f"Profile {self.name!r} has no pattern for {field}")
+            try:
+                pattern = re.compile(patterns[field])
+            except re.error as e:
+                raise ProfileError(f"Profile {self.name!r} has an invalid {field} pattern: {e}")
+            if pattern.groups < groups:
+                raise ProfileError(f"Profile {self.name!r}: the {field} pattern must capture at least {groups} group(s)")
+            self.patterns[field] = pattern
+
+        self.min_columns = max([index + 1 for index in self.columns.values() if isinstance(index, int)], default=0)
+
+    def score(self, cells):
+        """
+        Number of header keywords found in a table's first row.
+        """
+        headers = [str(cell).strip().lower() for cell in cells if cell is not None]
+        return sum(any(keyword in header for header in headers) for keyword in self.header_keywords)
+
+    def matches(self, cells):
+        return self.score(cells) >= self.min_keyword_matches
+
+    def column(self, df, role):
+        """
+        Name of the column of `df` that plays `role`, or None for a named column the table lacks.
+        """
+        column = self.columns[role]
+        if isinstance(column, str):
+            return column if column in df.columns else None
+        if column >= len(df.columns):
+            raise ValueError(f"The {self.name} layout needs at least {self.min_columns} columns, got {len(df.columns)}")
+        return df.columns[column]
+
+
+def compile_profiles(specs):
+    profiles = [Profile(spec) for spec in specs]
+    names = [profile.name for profile in profiles]
+    if len(set(names)) != len(names):
+        raise ProfileError("Extraction profile names must be unique")
+    return profiles
+
+
+# Compiled and validated once, at import
+PROFILES = compile_profiles(PROFILE_SPECS)
+PROFILES_BY_NAME = {profile.name: profile for profile in PROFILES}
+DEFAULT_PROFILE = PROFILES_BY_NAME['ncrp']
+
+
+def match_profile(cells, profiles=PROFILES):
+    """
+    Returns the profile whose header fingerprint best matches a table's first
+    row, or None if the row is no known transaction table header.
+    """
+    best, best_score = None, 0
+    for profile in profiles:
+        score = profile.score(cells)
+        if score >= profile.min_keyword_matches and score > best_score:
+            best, best_score = profile, score
+    return best
@@ -1,341 +1,238 @@
 from flask import request, jsonify
 import os
+import zipfile
 from werkzeug.utils import secure_filename
-import pandas as pd
-import json
-import networkx as nx
-from pyvis.network import Network
+from job_queue import QueueFullError, DuplicateJobError
+from pipeline import run_pipeline, run_batch_pipeline, DEFAULT_EXPORTS
+from exporters import EXPORT_FORMATS
+import result_cache
+import metrics
+import checkpoints
 
-def handle_file_upload(app, process_pdf):
+# Limits of a batch upload: number of PDFs, and uncompressed size of the PDFs in a zip
+MAX_BATCH_FILES = 50
+MAX_ZIP_BYTES = 512 * 1024 * 1024
+
+
+def parse_output_options(form):
     """
-    Handles file upload, processing, and generation of Excel, JSON, and graph files.
+    Reads the export formats to write right away and whether to render the graph
+    page from an upload form. Raises ValueError on an unknown option.
     """
-    def upload_file():
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part'}), 400
+    # Export formats to write right away instead of on first download
+    exports = form.get('exports')
+    exports = tuple(exports.split(',')) if exports else DEFAULT_EXPORTS
+    if any(kind not in EXPORT_FORMATS for kind in exports):
+        raise ValueError(f"Unknown export format, expected any of: {', '.join(EXPORT_FORMATS)}")
 
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
+    # "json" skips rendering the graph page for frontends that draw the graph data themselves;
+    # the page is then rendered on its first download
+    graph_format = form.get('graph', 'html')
+    if graph_format not in ('html', 'json'):
+        raise ValueError('Unknown graph format, expected html or json')
 
-        if file and file.filename.endswith('.pdf'):
-            filename = secure_filename(file.filename)
+    return exports, graph_format == 'html'
 
-            upload_folder = app.config['UPLOAD_FOLDER']
-            processed_folder = app.config['PROCESSED_FOLDER']
 
-            # Ensure folders exist
-            os.makedirs(upload_folder, exist_ok=True)
-            os.makedirs(processed_folder, exist_ok=True)
+def profile_requested(args):
+    """
+    Whether an upload asked for its job to be run under cProfile (?profile=1).
+    """
+    return args.get('profile', '').lower() in ('1', 'true', 'yes')
 
-            filepath = os.path.join(upload_folder, filename)
-            file.save(filepath)
 
-            # Process the uploaded PDF
-            df = process_pdf(filepath)
-            if df is None:
-                return jsonify({'error': 'Failed to process the PDF file'}), 500
+def _queued_response(message, job_id, profile, **extra):
+    response = {
+        'message': message,
+        'job_id': job_id,
+        **extra,
+        'status_url': f'/jobs/{job_id}',
+        'result_url': f'/jobs/{job_id}/result'
+    }
+    if profile:
+        response['profile_url'] = f'/jobs/{job_id}/profile'
+    return response
+
+
+def handle_file_upload(app, process_pdf, job_queue):
+    """
+    Handles file upload and queues the generation of Excel, JSON, and graph files,
+    unless the same PDF has already been processed.
+    """
+    def upload_file():
+        if request.mimetype == 'application/pdf':
+            # A raw PDF body is streamed straight to disk, without a multipart copy first;
+            # its name and output options come from the query string
+            filename = secure_filename(request.args.get('filename', '')) or 'upload.pdf'
+            if not filename.endswith('.pdf'):
+                return jsonify({'error': 'Invalid file type'}), 400
+            stream, options = request.stream, request.args
+        else:
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file part'}), 400
+
+            file = request.files['file']
+            if file.filename == '':
+                return jsonify({'error': 'No selected file'}), 400
+            if not file.filename.endswith('.pdf'):
+                return jsonify({'error': 'Invalid file type'}), 400
+            filename = secure_filename(file.filename)
+            stream, options = file.stream, request.form
+
+        upload_folder = app.config['UPLOAD_FOLDER']
+        processed_folder = app.config['PROCESSED_FOLDER']
+
+        # Ensure folders exist
+        os.makedirs(upload_folder, exist_ok=True)
+        os.makedirs(processed_folder, exist_ok=True)
+
+        try:
+            exports, render_html = parse_output_options(options)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Save the upload, hashing and checking its bytes as they arrive
+        try:
+            with metrics.timed('pipeline_stage_seconds', stage='save'):
+                digest, filepath = result_cache.save_stream(stream, upload_folder, filename,
+                                                            app.config['MAX_UPLOAD_BYTES'])
+        except result_cache.UploadTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except result_cache.InvalidUploadError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Outputs are cached by content, so a re-upload of the same PDF is answered right away
+        cached = result_cache.lookup(processed_folder, digest)
+        if cached is not None:
+            os.remove(filepath)
+            return jsonify({
+                'message': 'File uploaded and processed successfully',
+                'cached': True,
+                **cached
+            }), 200
 
-            # Save the processed data as Excel
-            excel_filename = os.path.splitext(filename)[0] + '.xlsx'
-            excel_path = os.path.join(app.config['PROCESSED_FOLDER'], excel_filename)
+        # A PDF already being processed, by any worker, is answered with that job
+        profile = profile_requested(request.args)
+        job_id = checkpoints.active_job(app.config['CHECKPOINT_FOLDER'], app.config['JOBS_FOLDER'], digest)
+        if job_id is not None:
+            os.remove(filepath)
+            return jsonify(_queued_response('File is already being processed', job_id, False)), 202
 
-            # Step 1: Read the Excel file
-            # data = pd.read_excel(excel_path)
-            data=df
+        # Process the uploaded PDF in the job worker pool
+        try:
+            job_id = job_queue.submit(run_pipeline, process_pdf, filepath, processed_folder, digest, filename, exports,
+                                      render_html, app.config['GRAPH_DB'], profile, app.config['CHECKPOINT_FOLDER'],
+                                      app.config['JOB_TIME_BUDGET'], key=digest)
+        except DuplicateJobError as e:
+            os.remove(filepath)
+            return jsonify(_queued_response('File is already being processed', e.job_id, False)), 202
+        except QueueFullError as e:
+            os.remove(filepath)
+            return jsonify({'error': str(e)}), 503
 
-            # Step 2: Transform the data
-            result = {}
-            for column_name in data.columns:
-                for index, value in data[column_name].items():
-                    if index not in result:
-                        result[index] = {}
-                    result[index][column_name] = value
-
-            # Step 3: Convert the result dictionary to a DataFrame
-            df_transformed = pd.DataFrame.from_dict(result, orient='index')
-
-            df_transformed.to_excel(excel_path, index=False)
-
-            # Transform the Excel data into a nested dictionary and save as JSON
-            json_filename = os.path.splitext(filename)[0] + '.json'
-            json_path = os.path.join(app.config['PROCESSED_FOLDER'], json_filename)
-
-            # Step 4: Save the DataFrame as a JSON file
-            df_transformed.to_json(json_path, orient='index', force_ascii=False)
-
-            # Generate the graph visualization
-            graph_html_filename = os.path.splitext(filename)[0] + '_graph.html'
-            graph_html_path = os.path.join(app.config['PROCESSED_FOLDER'], graph_html_filename)
-
-            # Read the JSON file
-            with open(json_path, "r") as f:
-                data = json.load(f)
-
-            BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-            bank_icon_file = os.path.join(BASE_DIR, "bank.json")
-            with open(bank_icon_file, "r") as f:
-                raw_bank_icon_map = json.load(f)
-                bank_icon_map = {key.lower(): value for key, value in raw_bank_icon_map.items()}
-
-            # Get default icon URL
-            # DEFAULT_ICON = bank_icon_map.get("DEFAULT", None)
-
-
-            # Create a directed graph
-            G = nx.DiGraph()
-
-            root_node_id = None
-
-            # Counter for generating unique IDs for missing accounts
-            missing_account_counter = 1
-            missing_account_prefix = "Missing_A_"
-
-            # Build mappings: account -> bank name (including for missing account records)
-            acc_to_bank = {}
-            missing_account_map = {}  # Optional extra mapping if needed later
-
-
-            # Add nodes and edges with metadata
-            for key, record in data.items():
-                # Extract fields and replace None with "Not available"
-                parent_account = record.get("Second Col Account Number", "Not available")
-                if not parent_account or str(parent_account).strip() == "":
-                    parent_account = f"{missing_account_prefix}{missing_account_counter}"
-                    missing_account_counter += 1
-                else:
-                    parent_account = str(parent_account)
-
-                # Handle child account
-                child_account = record.get("Account Number")
-                child_bank_name = record.get("Processed_Bank_Name", "Unknown").lower()
-
-                if not child_account or str(child_account).strip() == "":
-                    child_account = f"{missing_account_prefix}{missing_account_counter}"
-                    acc_to_bank[child_account] = child_bank_name
-                    missing_account_counter += 1
-                else:
-                    acc_to_bank[str(child_account)] = child_bank_name
-
-                layer = record.get("Layer", "Not available")
-                if layer is None:  # Check if layer is None
-                    print("Layer is None. Breaking the loop.")
-                    continue  # Exit the loop
-
-                if root_node_id is None and layer == 1:
-                    root_node_id = parent_account
-
-                transaction_id = "Not available"
-                if "Transaction ID / UTR Number" in record and record["Transaction ID / UTR Number"] is not None:
-                    transaction_id = record["Transaction ID / UTR Number"]
-                elif "Transaction ID \/ UTR Number" in record and record["Transaction ID \/ UTR Number"] is not None:
-                    transaction_id = record["Transaction ID \/ UTR Number"]
-
-                transaction_amount = record.get("Transaction Amount", "Not available")
-                if transaction_amount is None:
-                    transaction_amount = "Not available"
-
-                disputed_amount = record.get("Disputed Amount", "Not available")
-                if disputed_amount is None:
-                    disputed_amount = "Not available"
-
-                # 🌟 New fields
-                pre_date_info = record.get("Transaction status", "").lower()
-                cheque_no = record.get("Cheque No", "Not available")
-                transaction_date = record.get("Transaction Date", "Not available")
-
-                is_cash_withdrawal_cheque = "cash withdrawal" in pre_date_info and "cheque" in pre_date_info
-                is_same_account = parent_account == child_account
-
-                if is_cash_withdrawal_cheque or is_same_account:
-                    # Self-loop — do not change layer
-                    G.add_node(parent_account, type="account", layer=layer)
-                    G.add_edge(
-                        parent_account,
-                        parent_account,
-                        title=f"""
-                        Transaction ID: {transaction_id}
-                        Amount: {transaction_amount}
-                        Disputed: {disputed_amount}
-                        Transaction status: {pre_date_info}
-                        Cheque No: {cheque_no}
-                        Transaction Date: {transaction_date}
-                        """.strip()
-                    )   
-
-                else:
-                    # Normal transaction
-                    G.add_node(parent_account, type="account", layer=layer)
-                    G.add_node(child_account, type="account", layer=layer + 1)
-
-                    G.add_edge(
-                        parent_account,
-                        child_account,
-                        title=f"""
-                        Transaction ID: {transaction_id}
-                        Amount: {transaction_amount}
-                        Disputed: {disputed_amount}
-                        Transaction status: {pre_date_info}
-                        Transaction Date: {transaction_date}
-                        """.strip()
-                        )
-
-            # Visualize using Pyvis
-            net = Network(notebook=True, height="750px", width="100%", directed=True)
-
-            # Set visual options
-            net.set_options("""
-            {
-                "layout": {
-                    "hierarchical": {
-                        "enabled": true,
-                        "direction": "UD",
-                        "sortMethod": "directed"
-                }
-                },
-                "physics": {
-                    "hierarchicalRepulsion": {
-                        "nodeDistance": 250
-                    },
-                 "solver": "hierarchicalRepulsion"
-            },
-            "edges": {
-                "color": {
-                    "color": "rgba(100,100,100,0.4)",
-                    "highlight": "rgba(100,100,100,1)",
-                    "hover": "rgba(100,100,100,0.8)"
-                },
-                "width": 1.2,
-                "hoverWidth": 3.5,
-                "selectionWidth": 4,
-                "smooth": {
-                "type": "cubicBezier",
-                "forceDirection": "vertical",
-                "roundness": 1
-                },
-                "arrows": {
-                    "to": {
-                        "enabled": true
-                    }
-                }
-            },
-            "interaction": {
-                "hover": true,
-                "tooltipDelay": 200,
-                "dragView": true,
-                "zoomView": true,
-                "dragNodes": false
-            }
-            }
-            """)
-
-            # Add nodes with optional bank icons
-            for node, attr in G.nodes(data=True):
-                # Match the current node (account number) to a record's Account Number
-                bank_name = acc_to_bank.get(node, "unknown").lower()
-                icon_url = bank_icon_map.get(bank_name)
-                node_title = f"Account: {node}\nLayer: {attr['layer']}\nBank: {bank_name or 'Unknown'}"
-
-                node_options = {
-                    "label": node,
-                    "title": node_title,
-                    "group": attr["layer"],
-                    "level": attr["layer"],
-                    "size": 30
-                }
-
-                if icon_url:
-                    node_options.update({
-                        "shape": "image",
-                        "image": icon_url,
-                        "size": 40,
-                        "borderWidth": 1.5,
-                        "borderWidthSelected": 3
-                })
-                else:
-
-                    # Optional: Style for missing accounts
-                    if node.startswith(missing_account_prefix):
-                        node_options.update({
-                            "shape": "circle",
-                            "color": "#999999",
-                            "title": node_title + "\n(Missing Account)"
-                        })
-                    else:
-                        node_options.update({
-                            "shape": "circle",
-                            "color": "#92c952"
-                        })                    
-                    
-                net.add_node(node, **node_options)
-
-            # Add edges
-            for src, tgt, attr in G.edges(data=True):
-                net.add_edge(src, tgt, title=attr["title"])
-
-            net.show(graph_html_path)
-
-
-            # Add nodes to Pyvis network
-            for node, attributes in G.nodes(data=True):
-                node_title = f"Account: {node}\nLayer: {attributes['layer']}"
-                net.add_node(node, label=node, title=node_title, group=attributes["layer"])
-
-            # Add edges to Pyvis network
-            for source, target, attributes in G.edges(data=True):
-                net.add_edge(source, target, title=attributes["title"])
-
-            # Display the graph
-            net.show(graph_html_path)
-
-            # Inject custom styling and zoom-to-root JS
-            if root_node_id:
-                with open(graph_html_path, "r", encoding="utf-8") as f:
-                    html = f.read()
-
-                css_style = """
-                <style>
-                    .node canvas {
-                        filter: drop-shadow(1px 1px 2px rgba(0,0,0,0.3));
-                        transition: transform 0.2s ease;
-                    }
-                    .node:hover canvas {
-                        transform: scale(1.1);
-                    }
-                </style>
-                """
-
-                js_focus = f"""
-                <script type="text/javascript">
-                window.addEventListener("load", function () {{
-                    network.once("afterDrawing", function() {{
-                        network.focus("{root_node_id}", {{
-                            scale: 1.5,
-                            animation: {{
-                                duration: 1000,
-                                easingFunction: "easeInOutQuad"
-                            }}
-                        }});
-                    }});
-                }});
-                </script>
-                </body>"""
-
-                html = html.replace("<head>", "<head>" + css_style)
-                html = html.replace("</body>", js_focus)
-
-                with open(graph_html_path, "w", encoding="utf-8") as f:
-                    f.write(html)
+        return jsonify(_queued_response('File uploaded, processing started', job_id, profile)), 202
 
+    return upload_file
 
 
+def save_batch_files(files, upload_folder, max_bytes=result_cache.MAX_UPLOAD_BYTES):
+    """
+    Saves the PDFs of a batch upload, extracting those inside zip archives.
+    Returns the (name, digest, path) of every PDF. Raises ValueError on a file
+    that is not a PDF or zip, or on a batch over the limits, and
+    result_cache.UploadTooLargeError on a PDF over `max_bytes`.
+    """
+    saved = []
+    try:
+        for file in files:
+            filename = secure_filename(file.filename)
+            if filename.endswith('.zip'):
+                try:
+                    archive = zipfile.ZipFile(file.stream)
+                except zipfile.BadZipFile:
+                    raise ValueError(f"Invalid zip archive: {filename}")
+                with archive:
+                    members = [
+                        member for member in archive.infolist()
+                        if not member.is_dir() and member.filename.endswith('.pdf')
+                    ]
+                    if sum(member.file_size for member in members) > MAX_ZIP_BYTES:
+                        raise ValueError(f"Zip archive is too large: {filename}")
+                    if len(saved) + len(members) > MAX_BATCH_FILES:
+                        raise ValueError(f"Too many PDFs in the batch (at most {MAX_BATCH_FILES})")
+                    for member in members:
+                        name = secure_filename(os.path.basename(member.filename))
+                        with archive.open(member) as stream:
+                            digest, filepath = result_cache.save_stream(stream, upload_folder, name, max_bytes)
+                        saved.append((name, digest, filepath))
+            elif filename.endswith('.pdf'):
+                digest, filepath = result_cache.save_upload(file, upload_folder, filename, max_bytes)
+                saved.append((filename, digest, filepath))
+            else:
+                raise ValueError(f"Invalid file type: {file.filename}")
+
+            if len(saved) > MAX_BATCH_FILES:
+                raise ValueError(f"Too many PDFs in the batch (at most {MAX_BATCH_FILES})")
+    except Exception:
+        for _, _, filepath in saved:
+            os.remove(filepath)
+        raise
+    return saved
+
+
+def handle_batch_upload(app, process_pdf, job_queue):
+    """
+    Handles the upload of all PDFs of one case, as separate files or zip archives,
+    and queues their combined processing, unless the same set of PDFs has already
+    been processed.
+    """
+    def upload_batch():
+        files = [file for file in request.files.getlist('files') if file.filename != '']
+        if not files:
+            return jsonify({'error': 'No selected files'}), 400
+
+        try:
+            exports, render_html = parse_output_options(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        name = secure_filename(request.form.get('name', '')) or 'batch'
+
+        upload_folder = app.config['UPLOAD_FOLDER']
+        processed_folder = app.config['PROCESSED_FOLDER']
+        os.makedirs(upload_folder, exist_ok=True)
+        os.makedirs(processed_folder, exist_ok=True)
+
+        try:
+            with metrics.timed('pipeline_stage_seconds', stage='save'):
+                saved = save_batch_files(files, upload_folder, app.config['MAX_UPLOAD_BYTES'])
+        except result_cache.UploadTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not saved:
+            return jsonify({'error': 'No PDF files in the upload'}), 400
+
+        digest = result_cache.batch_digest([file_digest for _, file_digest, _ in saved])
+        cached = result_cache.lookup(processed_folder, digest)
+        if cached is not None:
+            for _, _, filepath in saved:
+                os.remove(filepath)
             return jsonify({
-                'message': 'File uploaded and processed successfully',
-                'excel_download_url': f'/download-excel?filename={excel_filename}',
-                'json_download_url': f'/download-json?filename={json_filename}',
-                'graph_html_url': f'/download-graph?filename={graph_html_filename}'
+                'message': 'Files uploaded and processed successfully',
+                'cached': True,
+                **cached
             }), 200
 
-        return jsonify({'error': 'Invalid file type'}), 400
+        profile = profile_requested(request.args)
+        try:
+            job_id = job_queue.submit(run_batch_pipeline, process_pdf, saved, processed_folder, digest, name, exports,
+                                      render_html, app.config['GRAPH_DB'], profile)
+        except QueueFullError as e:
+            for _, _, filepath in saved:
+                os.remove(filepath)
+            return jsonify({'error': str(e)}), 503
+
+        return jsonify(_queued_response('Files uploaded, processing started', job_id, profile,
+                                        files=[file_name for file_name, _, _ in saved])), 202
 
-    return upload_file
\ No newline at end of file
+    return upload_batch
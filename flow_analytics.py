@@ -0,0 +1,167 @@
+import threading
+import weakref
+import numpy as np
+
+
+# Stop tracing once less than this amount is still moving through the graph
+TRACE_EPSILON = 0.01
+
+# Upper bound of the propagation rounds; money going round a cycle is left where it is after it
+MAX_TRACE_ROUNDS = 256
+
+_adjacency = weakref.WeakKeyDictionary()
+_adjacency_lock = threading.Lock()
+
+
+class FlowGraph:
+    """
+    Array-backed adjacency of a transaction graph: accounts are numbered, and
+    every transaction is an entry of the source, target and amount arrays.
+    Self-loops (cash withdrawals, cheques, transfers to the same account) are
+    where money leaves the graph.
+    """
+    def __init__(self, G):
+        self.accounts = list(G)
+        self.index = {node: i for i, node in enumerate(self.accounts)}
+        n = len(self.accounts)
+
+        self.layers = np.array([_layer(attr) for _, attr in G.nodes(data=True)], dtype=np.int64)
+        self.banks = [attr.get("bank") for _, attr in G.nodes(data=True)]
+
+        # One pass over the attribute dicts; everything after it works on arrays
+        m = G.number_of_edges()
+        sources, targets, amounts = zip(*G.edges(data="amount")) if m else ((), (), ())
+        self.src = np.fromiter(map(self.index.__getitem__, sources), dtype=np.int64, count=m)
+        self.dst = np.fromiter(map(self.index.__getitem__, targets), dtype=np.int64, count=m)
+        amounts = np.array(amounts, dtype=np.float64)  # None becomes nan
+        # Transactions without an amount move nothing
+        self.amounts = np.nan_to_num(amounts, nan=0.0)
+        self.loops = self.src == self.dst
+
+        transfers = ~self.loops
+        self.inflow = np.bincount(self.dst[transfers], weights=self.amounts[transfers], minlength=n)
+        self.outflow = np.bincount(self.src[transfers], weights=self.amounts[transfers], minlength=n)
+        self.withdrawn = np.bincount(self.src[self.loops], weights=self.amounts[self.loops], minlength=n)
+
+    def trace(self, start, amount=None):
+        """
+        Traces `amount` (by default everything `start` sent on) forward from the
+        account numbered `start`. Every account passes on what reaches it in
+        proportion to the amounts of its outgoing transactions. Returns the
+        amount that reached each account, the part of it each withdrew and the
+        part each kept because it sent nothing on.
+        """
+        n = len(self.accounts)
+        sent = self.outflow + self.withdrawn
+        # Share of its sender's outgoing money carried by each transaction
+        shares = np.divide(self.amounts, sent[self.src], out=np.zeros_like(self.amounts), where=sent[self.src] > 0)
+
+        reached = np.zeros(n)
+        withdrawn = np.zeros(n)
+        held = np.zeros(n)
+        moving = np.zeros(n)
+        moving[start] = sent[start] if amount is None else amount
+        sinks = sent <= 0
+
+        for _ in range(MAX_TRACE_ROUNDS):
+            held[sinks] += moving[sinks]
+            flows = moving[self.src] * shares
+            withdrawn += np.bincount(self.src[self.loops], weights=flows[self.loops], minlength=n)
+            moving = np.bincount(self.dst[~self.loops], weights=flows[~self.loops], minlength=n)
+            reached += moving
+            if moving.sum() < TRACE_EPSILON:
+                break
+        held[sinks] += moving[sinks]
+        return reached, withdrawn, held
+
+
+def _layer(attr):
+    layer = attr.get("layer")
+    return layer if isinstance(layer, int) else -1
+
+
+def flow_graph(G):
+    """
+    Returns the FlowGraph of a transaction graph, built once per graph.
+    """
+    with _adjacency_lock:
+        flows = _adjacency.get(G)
+    if flows is None:
+        flows = FlowGraph(G)
+        with _adjacency_lock:
+            _adjacency[G] = flows
+    return flows
+
+
+def _account_entry(flows, i, traced, traced_withdrawn, held):
+    return {
+        "account": flows.accounts[i],
+        "layer": int(flows.layers[i]),
+        "bank": flows.banks[i],
+        "inflow": float(flows.inflow[i]),
+        "outflow": float(flows.outflow[i]),
+        "withdrawn": float(flows.withdrawn[i]),
+        "traced": float(traced[i]),
+        "traced_withdrawn": float(traced_withdrawn[i]),
+        "traced_held": float(held[i]),
+    }
+
+
+def _top(values, n):
+    # Indexes of the n largest positive values, largest first
+    candidates = np.flatnonzero(values > 0)
+    if len(candidates) > n:
+        candidates = candidates[np.argpartition(values[candidates], -n)[-n:]]
+    return candidates[np.argsort(values[candidates], kind="stable")[::-1]]
+
+
+def flow_summary(G, account=None, amount=None, top=100):
+    """
+    Flow analytics of a transaction graph: inflow and outflow per account and
+    per layer, and the money traced forward from `account` (the root account by
+    default) to the accounts it reached and the terminal accounts it was
+    withdrawn from. Accounts and terminals list the `top` by traced amount.
+    Raises KeyError if the account is not in the graph.
+    """
+    flows = flow_graph(G)
+    account = G.graph.get("root") if account is None else account
+    if account not in flows.index:
+        raise KeyError(account)
+    start = flows.index[account]
+    traced, traced_withdrawn, held = flows.trace(start, amount)
+
+    layers = []
+    for layer in np.unique(flows.layers):
+        members = flows.layers == layer
+        layers.append({
+            "layer": int(layer),
+            "accounts": int(members.sum()),
+            "inflow": float(flows.inflow[members].sum()),
+            "outflow": float(flows.outflow[members].sum()),
+            "withdrawn": float(flows.withdrawn[members].sum()),
+            "traced": float(traced[members].sum()),
+            "traced_withdrawn": float(traced_withdrawn[members].sum()),
+            "traced_held": float(held[members].sum()),
+        })
+
+    terminals = np.flatnonzero(np.bincount(flows.src[flows.loops], minlength=len(flows.accounts)))
+    terminal_traced = np.zeros(len(flows.accounts))
+    terminal_traced[terminals] = traced_withdrawn[terminals]
+
+    sent = float(flows.outflow[start] + flows.withdrawn[start]) if amount is None else amount
+    return {
+        "account": account,
+        "traced_amount": sent,
+        "withdrawn_amount": float(traced_withdrawn.sum()),
+        # Money kept by accounts that sent nothing on
+        "held_amount": float(held.sum()),
+        # Money still going round a cycle when tracing stopped
+        "unresolved_amount": max(sent - float(traced_withdrawn.sum()) - float(held.sum()), 0.0),
+        "total_accounts": len(flows.accounts),
+        "total_edges": int(len(flows.src)),
+        "total_terminals": int(len(terminals)),
+        "layers": layers,
+        "accounts": [_account_entry(flows, i, traced, traced_withdrawn, held) for i in _top(traced, top)],
+        "terminals": [_account_entry(flows, i, traced, traced_withdrawn, held)
+                      for i in _top(terminal_traced, top)],
+    }
@@ -0,0 +1,126 @@
+import networkx as nx
+from transactions import iter_rows
+
+
+# Transaction columns the graph builder reads
+GRAPH_COLUMNS = ('parent', 'child', 'bank', 'bank_id', 'layer', 'utr', 'amount', 'disputed', 'status', 'cheque', 'date_text', 'flags')
+
+# Prefix of the generated IDs of missing accounts
+MISSING_ACCOUNT_PREFIX = "Missing_A_"
+
+
+def build_graph(table):
+    """
+    Builds the transaction graph of a transaction table (see transactions.py).
+    Nodes are accounts with their layer, bank name and canonical bank id, edges
+    carry the transaction tooltip, amount and anomaly flags, and the first layer 1
+    account is stored as G.graph['root'].
+    """
+    # Create a directed graph
+    G = nx.DiGraph()
+
+    root_node_id = None
+
+    # Counter for generating unique IDs for missing accounts
+    missing_account_counter = 1
+    missing_account_prefix = MISSING_ACCOUNT_PREFIX
+
+    # Build mappings: account -> bank name (including for missing account records)
+    acc_to_bank = {}
+    acc_to_bank_id = {}
+
+    # Add nodes and edges with metadata
+    for (parent_account, child_account, child_bank_name, child_bank_id, layer, transaction_id,
+         transaction_amount, disputed_amount, pre_date_info, cheque_no, transaction_date, flags) in iter_rows(table, GRAPH_COLUMNS):
+        # Replace missing parent accounts with generated IDs
+        if not parent_account or str(parent_account).strip() == "":
+            parent_account = f"{missing_account_prefix}{missing_account_counter}"
+            missing_account_counter += 1
+        else:
+            parent_account = str(parent_account)
+
+        # Handle child account
+        child_bank_name = "unknown" if child_bank_name is None else child_bank_name.lower()
+
+        if not child_account or str(child_account).strip() == "":
+            child_account = f"{missing_account_prefix}{missing_account_counter}"
+            missing_account_counter += 1
+        else:
+            child_account = str(child_account)
+        acc_to_bank[child_account] = child_bank_name
+        acc_to_bank_id[child_account] = child_bank_id
+
+        if layer is None:  # Check if layer is None
+            print("Layer is None. Breaking the loop.")
+            continue  # Exit the loop
+
+        if root_node_id is None and layer == 1:
+            root_node_id = parent_account
+
+        if transaction_id is None:
+            transaction_id = "Not available"
+
+        # Numeric amount for ranking and aggregating flows
+        amount = transaction_amount
+
+        if transaction_amount is None:
+            transaction_amount = "Not available"
+
+        if disputed_amount is None:
+            disputed_amount = "Not available"
+
+        # 🌟 New fields
+        pre_date_info = (pre_date_info or "").lower()
+
+        is_cash_withdrawal_cheque = "cash withdrawal" in pre_date_info and "cheque" in pre_date_info
+        is_same_account = parent_account == child_account
+
+        # Duplicate, split and burst flags, shown in the tooltip when set
+        flag_note = f"\nFlags: {flags}" if flags else ""
+
+        if is_cash_withdrawal_cheque or is_same_account:
+            # Self-loop — do not change layer
+            G.add_node(parent_account, type="account", layer=layer)
+            G.add_edge(
+                parent_account,
+                parent_account,
+                title=(
+                    f"Transaction ID: {transaction_id}\n"
+                    f"Amount: {transaction_amount}\n"
+                    f"Disputed: {disputed_amount}\n"
+                    f"Transaction status: {pre_date_info}\n"
+                    f"Cheque No: {cheque_no}\n"
+                    f"Transaction Date: {transaction_date}"
+                    f"{flag_note}"
+                ),
+                amount=amount,
+                flags=flags
+            )
+
+        else:
+            # Normal transaction
+            G.add_node(parent_account, type="account", layer=layer)
+            G.add_node(child_account, type="account", layer=layer + 1)
+
+            G.add_edge(
+                parent_account,
+                child_account,
+                title=(
+                    f"Transaction ID: {transaction_id}\n"
+                    f"Amount: {transaction_amount}\n"
+                    f"Disputed: {disputed_amount}\n"
+                    f"Transaction status: {pre_date_info}\n"
+                    f"Transaction Date: {transaction_date}"
+                    f"{flag_note}"
+                ),
+                amount=amount,
+                flags=flags
+            )
+
+    # The bank of an account is known from the records it receives money in
+    for node, attr in G.nodes(data=True):
+        attr["bank"] = acc_to_bank.get(node, "unknown").lower()
+        attr["bank_id"] = acc_to_bank_id.get(node)
+
+    G.graph["root"] = root_node_id
+    return G
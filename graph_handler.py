@@ -0,0 +1,223 @@
+from flask import request, jsonify
+import re
+import math
+import pandas as pd
+from graph_query import load_graph, query_graph, load_case, view_graph
+from graph_renderer import graph_data, dumps_graph_data, render_page
+from flow_analytics import flow_summary
+
+DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# Query parameters of the graph query route and their types
+QUERY_PARAMS = {
+    'min_layer': int,
+    'max_layer': int,
+    'account': str,
+    'hops': int,
+    'top': int,
+    'collapse_below': float,
+}
+
+
+def parse_query(args):
+    """
+    Converts the graph query parameters of a request. Raises ValueError on an invalid value.
+    """
+    query = {}
+    for name, convert in QUERY_PARAMS.items():
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            query[name] = convert(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value}")
+    for name in ('hops', 'top'):
+        if query.get(name, 0) < 0:
+            raise ValueError(f"{name} must not be negative")
+    return query
+
+
+def handle_graph_query(app):
+    """
+    Returns part of the transaction graph of a processed PDF as compact graph data,
+    so that the frontend only loads what it shows for large cases.
+    """
+    def graph_query(digest):
+        if not DIGEST_PATTERN.fullmatch(digest):
+            return jsonify({'error': 'Graph not found'}), 404
+
+        try:
+            query = parse_query(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        G = load_graph(app.config['PROCESSED_FOLDER'], digest)
+        if G is None:
+            return jsonify({'error': 'Graph not found'}), 404
+
+        try:
+            H = query_graph(G, **query)
+        except KeyError:
+            return jsonify({'error': 'Account not found'}), 404
+
+        data = graph_data(H)
+        data['total_nodes'] = G.number_of_nodes()
+        data['total_edges'] = G.number_of_edges()
+        return app.response_class(dumps_graph_data(data), mimetype='application/json')
+
+    return graph_query
+
+
+# Query parameters of the flow analytics route and their types
+FLOW_PARAMS = {
+    'account': str,
+    'amount': float,
+    'top': int,
+}
+
+# Accounts and terminals listed by default
+DEFAULT_FLOW_TOP = 100
+
+
+def parse_flow_query(args):
+    """
+    Converts the flow analytics parameters of a request. Raises ValueError on an invalid value.
+    """
+    query = {}
+    for name, convert in FLOW_PARAMS.items():
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            query[name] = convert(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value}")
+    if query.get('amount', 0) < 0 or query.get('top', 0) < 0:
+        raise ValueError("amount and top must not be negative")
+    query.setdefault('top', DEFAULT_FLOW_TOP)
+    return query
+
+
+def handle_flow_analytics(app):
+    """
+    Returns the inflow and outflow of the accounts and layers of a processed PDF's
+    transaction graph, and where the money of its root account (or another) went.
+    """
+    def flow_analytics(digest):
+        if not DIGEST_PATTERN.fullmatch(digest):
+            return jsonify({'error': 'Graph not found'}), 404
+
+        try:
+            query = parse_flow_query(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        G = load_graph(app.config['PROCESSED_FOLDER'], digest)
+        if G is None:
+            return jsonify({'error': 'Graph not found'}), 404
+
+        try:
+            summary = flow_summary(G, **query)
+        except KeyError:
+            return jsonify({'error': 'Account not found'}), 404
+        return jsonify(summary), 200
+
+    return flow_analytics
+
+
+# Query parameters of the graph view route and their types
+VIEW_PARAMS = {
+    'start': pd.Timestamp,
+    'end': pd.Timestamp,
+    'hours': float,
+    'min_amount': float,
+    'max_amount': float,
+    'limit': int,
+}
+
+# Transactions a view draws at most (the largest amounts of larger matches)
+MAX_VIEW_TRANSACTIONS = 20000
+
+
+def parse_view(args):
+    """
+    Converts the graph view parameters of a request. Raises ValueError on an invalid value.
+    """
+    view = {}
+    for name, convert in VIEW_PARAMS.items():
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            view[name] = convert(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value}")
+    for name in ('start', 'end'):
+        if name in view and view[name] is pd.NaT:
+            raise ValueError(f"Invalid value for {name}")
+        if name in view and view[name].tzinfo is not None:
+            # Report dates are local times without a zone
+            view[name] = view[name].tz_localize(None)
+        if name in view and not pd.Timestamp.min <= view[name] <= pd.Timestamp.max:
+            raise ValueError(f"{name} must be between {pd.Timestamp.min.year + 1} and {pd.Timestamp.max.year - 1}")
+    if 'hours' in view and 'end' in view:
+        raise ValueError("Provide either end or hours")
+    if 'hours' in view:
+        if not math.isfinite(view['hours']) or view['hours'] <= 0:
+            raise ValueError("hours must be a positive number")
+        try:
+            view['hours'] = pd.Timedelta(hours=view['hours'])
+        except (OverflowError, ValueError):
+            raise ValueError("hours is too large")
+    if not 0 < view.setdefault('limit', MAX_VIEW_TRANSACTIONS) <= MAX_VIEW_TRANSACTIONS:
+        raise ValueError(f"limit must be between 1 and {MAX_VIEW_TRANSACTIONS}")
+    return view
+
+
+def handle_graph_view(app):
+    """
+    Returns the graph of a processed PDF's transactions within a time window
+    (start/end, or hours from start or from the first transaction) and amount
+    range, as graph data or, with format=html, as a page to open in a browser.
+    """
+    def graph_view(digest):
+        if not DIGEST_PATTERN.fullmatch(digest):
+            return jsonify({'error': 'Graph not found'}), 404
+
+        try:
+            view = parse_view(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        case = load_case(app.config['PROCESSED_FOLDER'], digest)
+        if case is None:
+            return jsonify({'error': 'Graph not found'}), 404
+        table, index = case
+
+        hours = view.pop('hours', None)
+        if hours is not None:
+            start = view.get('start')
+            if start is None and index.first_date() is not None:
+                start = view['start'] = pd.Timestamp(index.first_date())
+            if start is not None:
+                try:
+                    end = start + hours
+                except (OverflowError, ValueError):
+                    end = None
+                if end is None or end > pd.Timestamp.max:
+                    return jsonify({'error': "start plus hours is out of range"}), 400
+                view['end'] = end
+
+        G, matched = view_graph(table, index, **view)
+        data = graph_data(G)
+        data['matched_transactions'] = matched
+        data['total_transactions'] = len(table)
+        data['truncated'] = matched > view['limit']
+
+        document = dumps_graph_data(data)
+        if request.args.get('format') == 'html':
+            return app.response_class(render_page(document), mimetype='text/html')
+        return app.response_class(document, mimetype='application/json')
+
+    return graph_view
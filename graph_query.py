@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict
+import networkx as nx
+import result_cache
+import exporters
+import transactions
+from edge_index import EdgeIndex
+from graph_builder import build_graph
+
+
+# Number of built graphs each process keeps in memory
+GRAPH_CACHE_SIZE = 8
+
+# Leaves of a parent are only collapsed when there are at least this many
+MIN_CLUSTER_SIZE = 2
+
+_graphs = OrderedDict()
+_cases = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def load_table(entry_dir):
+    try:
+        return transactions.load_transactions(entry_dir)
+    except (FileNotFoundError, transactions.SchemaError):
+        # Entries cached before transaction tables, or their current schema, existed
+        return transactions.from_frame(exporters.load_snapshot(entry_dir))
+
+
+def load_graph(processed_folder, digest):
+    """
+    Returns the transaction graph of a cache entry, built from its transaction
+    table and kept in a small in-process LRU. Returns None if the entry does not exist.
+    """
+    if result_cache.lookup(processed_folder, digest) is None:
+        return None
+    entry_dir = os.path.join(processed_folder, digest)
+    return _cached(_graphs, digest, lambda: build_graph(load_table(entry_dir)))
+
+
+def load_case(processed_folder, digest):
+    """
+    Returns the transaction table and edge index of a cache entry, kept in a
+    small in-process LRU. Returns None if the entry does not exist.
+    """
+    if result_cache.lookup(processed_folder, digest) is None:
+        return None
+    entry_dir = os.path.join(processed_folder, digest)
+
+    def load():
+        table = load_table(entry_dir)
+        try:
+            index = EdgeIndex.load(entry_dir)
+        except FileNotFoundError:
+            # Entries cached before edge indexes existed
+            index = EdgeIndex.build(table)
+        if index.count != len(table):
+            index = EdgeIndex.build(table)
+        return table, index
+
+    return _cached(_cases, digest, load)
+
+
+def _cached(cache, digest, build):
+    with _graphs_lock:
+        if digest in cache:
+            cache.move_to_end(digest)
+            return cache[digest]
+
+    value = build()
+
+    with _graphs_lock:
+        cache[digest] = value
+        while len(cache) > GRAPH_CACHE_SIZE:
+            cache.popitem(last=False)
+    return value
+
+
+def view_graph(table, index, start=None, end=None, min_amount=None, max_amount=None, limit=None):
+    """
+    Graph of the transactions within a time window and amount range, found by
+    binary search in the case's edge index rather than by scanning the table.
+    Returns the graph and the number of matching transactions; when more than
+    `limit` match, only the largest amounts are drawn.
+    """
+    rows, matched = index.select(start, end, min_amount, max_amount, limit)
+    return build_graph(table.take(rows)), matched
+
+
+def _has_layer(attr, min_layer, max_layer):
+    layer = attr.get("layer")
+    if not isinstance(layer, int):
+        return False
+    return (min_layer is None or layer >= min_layer) and (max_layer is None or layer <= max_layer)
+
+
+def layer_range(G, min_layer=None, max_layer=None):
+    """
+    Subgraph of the accounts whose layer is within [min_layer, max_layer].
+    """
+    return G.subgraph(node for node, attr in G.nodes(data=True) if _has_layer(attr, min_layer, max_layer))
+
+
+def neighbourhood(G, account, hops):
+    """
+    Subgraph of the accounts at most `hops` transactions away from `account`,
+    following money in either direction.
+    """
+    return nx.ego_graph(G, account, radius=hops, undirected=True)
+
+
+def top_flows(G, n):
+    """
+    Subgraph of the `n` transactions with the largest amounts.
+    """
+    edges = [(src, tgt, attr["amount"]) for src, tgt, attr in G.edges(data=True) if attr.get("amount") is not None]
+    edges.sort(key=lambda edge: edge[2], reverse=True)
+    return G.edge_subgraph((src, tgt) for src, tgt, _ in edges[:n])
+
+
+def collapse_leaves(G, max_amount):
+    """
+    Replaces the leaf accounts of a parent that each received less than
+    `max_amount` with one aggregate node carrying their count and total amount.
+    Returns a new graph.
+    """
+    H = nx.DiGraph(G)
+    clusters = {}
+    for node in G:
+        if G.out_degree(node) or G.in_degree(node) != 1:
+            continue
+        (parent, _, attr), = G.in_edges(node, data=True)
+        if parent != node and (attr.get("amount") or 0) < max_amount:
+            clusters.setdefault(parent, []).append((node, attr.get("amount") or 0))
+
+    for parent, leaves in clusters.items():
+        if len(leaves) < MIN_CLUSTER_SIZE:
+            continue
+        total = sum(amount for _, amount in leaves)
+        aggregate = f"{parent}:collapsed"
+        H.remove_nodes_from(node for node, _ in leaves)
+        H.add_node(
+            aggregate,
+            type="aggregate",
+            layer=G.nodes[leaves[0][0]]["layer"],
+            bank="various",
+            count=len(leaves),
+            amount=total,
+        )
+        H.add_edge(
+            parent,
+            aggregate,
+            title=f"Collapsed transactions: {len(leaves)}\nTotal amount: {total}",
+            amount=total,
+        )
+    return H
+
+
+def query_graph(G, min_layer=None, max_layer=None, account=None, hops=None, top=None, collapse_below=None):
+    """
+    Applies the requested filters in order (layer range, neighbourhood of an
+    account, top flows, leaf collapsing) and returns the resulting graph.
+    Raises KeyError if `account` is not in the graph.
+    """
+    H = G
+    if min_layer is not None or max_layer is not None:
+        H = layer_range(H, min_layer, max_layer)
+    if account is not None:
+        if account not in H:
+            raise KeyError(account)
+        H = neighbourhood(H, account, 1 if hops is None else hops)
+    if top is not None:
+        H = top_flows(H, top)
+    if collapse_below is not None:
+        H = collapse_leaves(H, collapse_below)
+
+    H = nx.DiGraph(H)
+    root = G.graph.get("root")
+    H.graph["root"] = root if root in H else account
+    return H
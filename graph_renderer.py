@@ -0,0 +1,242 @@
+import os
+import json
+import uuid
+from jinja2 import Environment
+from werkzeug.security import safe_join
+import metrics
+from bank_index import BANK_INDEX
+from graph_builder import MISSING_ACCOUNT_PREFIX
+from result_cache import read_manifest, resolve_download
+
+
+# vis-network options of the transaction graph
+GRAPH_OPTIONS = {
+    "layout": {
+        "hierarchical": {
+            "enabled": True,
+            "direction": "UD",
+            "sortMethod": "directed"
+        }
+    },
+    "physics": {
+        "hierarchicalRepulsion": {
+            "nodeDistance": 250
+        },
+        "solver": "hierarchicalRepulsion"
+    },
+    "edges": {
+        "color": {
+            "color": "rgba(100,100,100,0.4)",
+            "highlight": "rgba(100,100,100,1)",
+            "hover": "rgba(100,100,100,0.8)"
+        },
+        "width": 1.2,
+        "hoverWidth": 3.5,
+        "selectionWidth": 4,
+        "smooth": {
+            "type": "cubicBezier",
+            "forceDirection": "vertical",
+            "roundness": 1
+        },
+        "arrows": {
+            "to": {
+                "enabled": True
+            }
+        }
+    },
+    "interaction": {
+        "hover": True,
+        "tooltipDelay": 200,
+        "dragView": True,
+        "zoomView": True,
+        "dragNodes": False
+    }
+}
+
+# Page that draws a graph data document with vis-network and zooms to its root account.
+# Compiled once; every render is a single pass writing straight to the output file.
+GRAPH_TEMPLATE = Environment(autoescape=False).from_string("""\
+<html>
+<head>
+<meta charset="utf-8">
+<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/dist/vis-network.min.css" integrity="sha512-WgxfT5LWjfszlPHXRmBWHkV2eceiWTOBvrKCNbdgDYTHrT2AeLCGbF4sZlZw3UMN3WtL0tGUoIAKsu8mllg/XA==" crossorigin="anonymous" referrerpolicy="no-referrer" />
+<script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js" integrity="sha512-LnvoEWDFrqGHlHmDD2101OrLcbsfkrzoSpvtSQtxK3RMnRV0eOkhhBN2dXHKRrUU8p2DGRTk35n4O8nWSVe1mQ==" crossorigin="anonymous" referrerpolicy="no-referrer"></script>
+<style>
+    #mynetwork {
+        width: 100%;
+        height: 750px;
+        background-color: #ffffff;
+        border: 1px solid lightgray;
+        position: relative;
+        float: left;
+    }
+    .node canvas {
+        filter: drop-shadow(1px 1px 2px rgba(0,0,0,0.3));
+        transition: transform 0.2s ease;
+    }
+    .node:hover canvas {
+        transform: scale(1.1);
+    }
+</style>
+</head>
+<body>
+<div id="mynetwork"></div>
+<script type="text/javascript">
+    var graph = {{ graph_data }};
+    var nodes = new vis.DataSet(graph.nodes);
+    var edges = new vis.DataSet(graph.edges);
+    var network = new vis.Network(document.getElementById("mynetwork"), {nodes: nodes, edges: edges}, graph.options);
+
+    if (graph.root !== null) {
+        window.addEventListener("load", function () {
+            network.once("afterDrawing", function() {
+                network.focus(graph.root, {
+                    scale: 1.5,
+                    animation: {
+                        duration: 1000,
+                        easingFunction: "easeInOutQuad"
+                    }
+                });
+            });
+        });
+    }
+</script>
+</body>
+</html>
+""")
+
+
+def _aggregate_options(node, attr):
+    # Leaf accounts collapsed by a graph query
+    return {
+        "id": node,
+        "label": f"{attr['count']} accounts",
+        "title": f"Collapsed accounts: {attr['count']}\nLayer: {attr['layer']}\nTotal amount: {attr['amount']}",
+        "group": attr["layer"],
+        "level": attr["layer"],
+        "size": 30,
+        "shape": "box"
+    }
+
+
+def _node_options(node, attr, bank_index):
+    if attr.get("type") == "aggregate":
+        return _aggregate_options(node, attr)
+
+    # Match the current node (account number) to a record's Account Number
+    bank_name = attr["bank"]
+    icon_url = bank_index.icon(attr.get("bank_id"))
+    node_title = f"Account: {node}\nLayer: {attr['layer']}\nBank: {bank_name or 'Unknown'}"
+
+    node_options = {
+        "id": node,
+        "label": node,
+        "title": node_title,
+        "group": attr["layer"],
+        "level": attr["layer"],
+        "size": 30
+    }
+
+    if icon_url:
+        node_options.update({
+            "shape": "image",
+            "image": icon_url,
+            "size": 40,
+            "borderWidth": 1.5,
+            "borderWidthSelected": 3
+        })
+    else:
+        # Nodes are colored by their layer's group
+        node_options["shape"] = "circle"
+        if node.startswith(MISSING_ACCOUNT_PREFIX):
+            node_options["title"] = node_title + "\n(Missing Account)"
+
+    return node_options
+
+
+def _edge_options(src, tgt, attr):
+    edge_options = {"from": src, "to": tgt, "title": attr["title"], "arrows": "to"}
+    if attr.get("flags"):
+        # Duplicated, split and burst transactions are drawn dashed
+        edge_options.update({"flags": attr["flags"].split(","), "dashes": True})
+    return edge_options
+
+
+def graph_data(G, bank_index=BANK_INDEX):
+    """
+    Converts a transaction graph to the vis-network nodes, edges and options
+    the frontend draws, with the root account to zoom to.
+    """
+    return {
+        "root": G.graph.get("root"),
+        "options": GRAPH_OPTIONS,
+        "nodes": [_node_options(node, attr, bank_index) for node, attr in G.nodes(data=True)],
+        "edges": [_edge_options(src, tgt, attr) for src, tgt, attr in G.edges(data=True)],
+    }
+
+
+def dumps_graph_data(data):
+    # Compact, and safe to embed in a <script> block: "<" can never close the tag
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("<", "\\u003c")
+
+
+def write_graph_data(data, path):
+    """
+    Writes a graph data document as compact JSON. Returns the serialized
+    document and the number of bytes written.
+    """
+    document = dumps_graph_data(data)
+    encoded = document.encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(encoded)
+    return document, len(encoded)
+
+
+def render_page(document):
+    """
+    Renders a serialized graph data document to a standalone HTML page, in memory.
+    """
+    return GRAPH_TEMPLATE.render(graph_data=document)
+
+
+def render_html(document, path):
+    """
+    Renders a serialized graph data document to a standalone HTML page.
+    Returns the number of bytes written.
+    """
+    # Written under a temporary name, so concurrent requests never serve a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        GRAPH_TEMPLATE.stream(graph_data=document).dump(tmp_path, encoding="utf-8")
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return size
+
+
+def resolve_graph(processed_folder, filename):
+    """
+    Returns the path of the graph page of a cache entry, rendering it from the
+    entry's graph data on first request. Returns None if it does not exist.
+    """
+    path = resolve_download(processed_folder, filename)
+    if path is not None:
+        return path
+
+    path = safe_join(processed_folder, filename)
+    if path is None:
+        return None
+    entry_dir, name = os.path.split(path)
+    manifest = read_manifest(entry_dir)
+    if manifest is None or manifest['artifacts'].get('graph') != name:
+        return None
+    data_path = os.path.join(entry_dir, manifest['artifacts'].get('graph_data', ''))
+    if not os.path.isfile(data_path):
+        return None
+
+    with open(data_path, "r", encoding="utf-8") as f, metrics.timed('pipeline_stage_seconds', stage='render'):
+        size = render_html(f.read(), path)
+    print(f"Rendered {filename} on demand ({size} bytes)")
+    return resolve_download(processed_folder, filename)
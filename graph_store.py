@@ -0,0 +1,216 @@
+import time
+import sqlite3
+from transactions import iter_rows
+
+
+# Transaction columns stored for every transaction
+STORE_COLUMNS = ('parent', 'child', 'ifsc', 'bank', 'utr', 'amount', 'date_text', 'layer')
+
+# Placeholders the processor uses for values it could not find
+MISSING_VALUES = ("", "Not available", "nan")
+
+# Accounts expanded per query while walking a connected component
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    digest TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    transactions INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    digest TEXT NOT NULL REFERENCES cases (digest) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    parent TEXT,
+    child TEXT,
+    ifsc TEXT,
+    bank TEXT,
+    utr TEXT,
+    amount REAL,
+    date TEXT,
+    layer INTEGER,
+    PRIMARY KEY (digest, row)
+);
+CREATE INDEX IF NOT EXISTS transactions_parent ON transactions (parent);
+CREATE INDEX IF NOT EXISTS transactions_child ON transactions (child);
+CREATE INDEX IF NOT EXISTS transactions_ifsc ON transactions (ifsc);
+CREATE INDEX IF NOT EXISTS transactions_utr ON transactions (utr);
+CREATE TABLE IF NOT EXISTS case_members (
+    digest TEXT NOT NULL REFERENCES cases (digest) ON DELETE CASCADE,
+    member TEXT NOT NULL,
+    PRIMARY KEY (digest, member)
+);
+CREATE INDEX IF NOT EXISTS case_members_member ON case_members (member);
+"""
+
+# Stores whose tables this process has created or found
+_ready = set()
+
+
+def create_schema(db_path):
+    """
+    Creates the tables of the graph store if needed and switches it to WAL mode,
+    which persists in the database file. Run once at startup; the store is
+    shared by every worker process.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+    finally:
+        conn.close()
+    _ready.add(db_path)
+
+
+def connect(db_path):
+    """
+    Opens the graph store, waiting on the locks of other workers. The tables are
+    created by the first connection of a process that did not create them at startup.
+    """
+    if db_path not in _ready:
+        create_schema(db_path)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def _clean(value):
+    if value is None or str(value).strip() in MISSING_VALUES:
+        return None
+    return str(value).strip()
+
+
+def iter_transactions(table):
+    for row, (parent, child, ifsc, bank, utr, amount, date, layer) in enumerate(iter_rows(table, STORE_COLUMNS)):
+        yield (
+            row,
+            _clean(parent),
+            _clean(child),
+            _clean(ifsc),
+            _clean(bank),
+            _clean(utr),
+            None if amount is None else float(amount),
+            _clean(date),
+            layer if isinstance(layer, int) else None,
+        )
+
+
+def upsert_case(db_path, digest, filename, table, members=()):
+    """
+    Stores the transaction table of a processed case, replacing any earlier copy
+    of the same case. A batch lists the digests of its PDFs as `members`: their
+    cases stored on their own are replaced by the batch, and are not stored again
+    while the batch is. Returns the number of transactions stored.
+    """
+    conn = connect(db_path)
+    try:
+        if not members and conn.execute("SELECT 1 FROM case_members WHERE member = ?", (digest,)).fetchone():
+            # Already stored as part of a batch
+            return 0
+        rows = [(digest, *transaction) for transaction in iter_transactions(table)]
+        with conn:
+            conn.execute("DELETE FROM cases WHERE digest = ?", (digest,))
+            conn.executemany("DELETE FROM cases WHERE digest = ?", [(member,) for member in members])
+            conn.execute(
+                "INSERT INTO cases (digest, filename, transactions, stored_at) VALUES (?, ?, ?, ?)",
+                (digest, filename, len(rows), time.time()),
+            )
+            conn.executemany(
+                "INSERT INTO transactions (digest, row, parent, child, ifsc, bank, utr, amount, date, layer)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany("INSERT OR IGNORE INTO case_members (digest, member) VALUES (?, ?)",
+                             [(digest, member) for member in members])
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def find_cases(db_path, account=None, ifsc=None, utr=None):
+    """
+    Returns the cases with a transaction from or to `account`, to an `ifsc`
+    branch, or with the given `utr`, with the number of matching transactions.
+    """
+    conditions, params = [], []
+    if account is not None:
+        conditions.append("(t.parent = ? OR t.child = ?)")
+        params += [account, account]
+    if ifsc is not None:
+        conditions.append("t.ifsc = ?")
+        params.append(ifsc)
+    if utr is not None:
+        conditions.append("t.utr = ?")
+        params.append(utr)
+    if not conditions:
+        return []
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT c.digest, c.filename, c.stored_at, COUNT(*) AS matches,"
+            " MIN(t.layer) AS min_layer, MAX(t.layer) AS max_layer"
+            " FROM transactions t JOIN cases c ON c.digest = t.digest"
+            f" WHERE {' AND '.join(conditions)}"
+            " GROUP BY c.digest ORDER BY c.stored_at",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def connected_component(db_path, account, max_accounts=1000):
+    """
+    Walks the transactions of every stored case outward from `account`, in either
+    direction, and returns the accounts, transactions and cases of its connected
+    component. Stops expanding once `max_accounts` accounts are reached.
+    Returns None if the account is not in the store.
+    """
+    conn = connect(db_path)
+    try:
+        seen = {account}
+        frontier = [account]
+        transactions = {}
+        while frontier:
+            batch, frontier = frontier[:BATCH_SIZE], frontier[BATCH_SIZE:]
+            marks = ",".join("?" * len(batch))
+            rows = conn.execute(
+                "SELECT digest, row, parent, child, ifsc, bank, utr, amount, date, layer FROM transactions"
+                f" WHERE parent IN ({marks}) UNION"
+                " SELECT digest, row, parent, child, ifsc, bank, utr, amount, date, layer FROM transactions"
+                f" WHERE child IN ({marks})",
+                batch + batch,
+            ).fetchall()
+            for row in rows:
+                transactions[(row["digest"], row["row"])] = dict(row)
+                for neighbour in (row["parent"], row["child"]):
+                    if neighbour is not None and neighbour not in seen and len(seen) < max_accounts:
+                        seen.add(neighbour)
+                        frontier.append(neighbour)
+
+        if not transactions:
+            return None
+
+        digests = sorted({digest for digest, _ in transactions})
+        cases = conn.execute(
+            f"SELECT digest, filename, stored_at FROM cases WHERE digest IN ({','.join('?' * len(digests))})",
+            digests,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    # Accounts at the edge of a truncated walk are kept, their other transactions are not
+    edges = [
+        t for t in transactions.values()
+        if (t["parent"] is None or t["parent"] in seen) and (t["child"] is None or t["child"] in seen)
+    ]
+    return {
+        "account": account,
+        "accounts": sorted(seen),
+        "transactions": edges,
+        "cases": [dict(case) for case in cases],
+        "truncated": len(seen) >= max_accounts,
+    }
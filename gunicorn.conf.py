@@ -0,0 +1,31 @@
+import os
+import time
+
+# Load the app (pandas, pdfplumber, networkx, the bank index, compiled templates
+# and regexes) once in the master; forked workers share it copy-on-write and
+# start serving without importing anything
+preload_app = os.environ.get('PRELOAD_APP', '1') != '0'
+
+
+def when_ready(server):
+    if preload_app:
+        import startup
+        startup.report('Master')
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.time()
+
+
+def child_exit(server, worker):
+    # The exited worker's counters would otherwise stay in /metrics
+    import metrics
+    metrics.remove_process(metrics.METRICS_FOLDER, worker.pid)
+
+
+def post_worker_init(worker):
+    import App
+    import startup
+    App.start_maintenance()
+    name = f"Worker {worker.age}" + (" (app preloaded by the master)" if preload_app else "")
+    startup.report(name, since=getattr(worker, "forked_at", None))
@@ -0,0 +1,73 @@
+import io
+import os
+import pstats
+from flask import request, jsonify, send_file
+from job_queue import profile_path
+
+# Functions listed in the text report of a profiled job
+PROFILE_TOP = 50
+
+
+def handle_job_status(job_queue):
+    """
+    Reports the status and per-stage progress of a queued upload.
+    """
+    def job_status(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job), 200
+
+    return job_status
+
+
+def handle_job_result(job_queue):
+    """
+    Returns the download URLs of a finished upload.
+    """
+    def job_result(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+
+        # Per-file status and timings of batch uploads
+        files = {'files': job['files']} if 'files' in job else {}
+
+        if job['status'] == 'failed':
+            return jsonify({'error': job['error'], 'job_id': job_id, **files}), 500
+
+        if job['status'] != 'done':
+            return jsonify({
+                'message': 'Job is still processing',
+                'job_id': job_id,
+                'status': job['status'],
+                'stage': job['stage']
+            }), 202
+
+        return jsonify({'message': 'File uploaded and processed successfully', **job['result'], **files}), 200
+
+    return job_result
+
+
+def handle_job_profile(job_queue):
+    """
+    Returns the cProfile report of a job uploaded with ?profile=1, as text sorted by
+    cumulative time, or the raw pstats dump with ?format=raw.
+    """
+    def job_profile(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        path = profile_path(job_queue.jobs_folder, job_id)
+        if not job.get('profiled') or not os.path.isfile(path):
+            return jsonify({'error': 'Job was not profiled'}), 404
+
+        if request.args.get('format') == 'raw':
+            return send_file(path, as_attachment=True, download_name=f'{job_id}.prof',
+                             mimetype='application/octet-stream')
+
+        report = io.StringIO()
+        pstats.Stats(path, stream=report).strip_dirs().sort_stats('cumulative').print_stats(PROFILE_TOP)
+        return report.getvalue(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+    return job_profile
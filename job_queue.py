@@ -0,0 +1,364 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # No file locks (Windows): owners are never known to be alive
+    fcntl = None
+
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Lock files of the live job queues, in the jobs folder
+OWNERS_FOLDER = 'owners'
+
+# Statuses of jobs that have not finished
+ACTIVE_STATUSES = ('queued', 'running', 'suspended')
+
+# Times a job whose pool process died (e.g. killed out of memory) is run again;
+# checkpointed jobs continue from their last completed chunk
+MAX_JOB_RESTARTS = int(os.environ.get('MAX_JOB_RESTARTS', 2))
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds its maximum number of pending jobs."""
+
+
+class DuplicateJobError(Exception):
+    """Raised when a job with the same key is already queued or running."""
+    def __init__(self, job_id):
+        super().__init__(f"Job {job_id} is already processing this file")
+        self.job_id = job_id
+
+
+class JobSuspended(Exception):
+    """Raised by a job that stopped early, to be queued again and continue where it left off."""
+
+
+# CPUs of a job pool process for pools of its own; None outside a job pool
+_cpu_share = None
+
+
+def available_cpus():
+    """
+    CPUs this process may run on: its CPU affinity, capped by the cgroup CPU
+    quota of its container. os.cpu_count() counts every CPU of the host.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_cpus():
+    """
+    CPUs the pools started by this process may use: inside a job, its share of
+    the job pool's CPUs, so that nested pools do not multiply the processes.
+    """
+    return _cpu_share or available_cpus()
+
+
+def _init_worker(cpus):
+    global _cpu_share
+    _cpu_share = cpus
+
+
+def _job_path(jobs_folder, job_id):
+    return os.path.join(jobs_folder, f"{job_id}.json")
+
+
+def profile_path(jobs_folder, job_id):
+    """
+    Path of the cProfile dump of a profiled job, or None for an invalid job id.
+    """
+    if not JOB_ID_PATTERN.fullmatch(str(job_id)):
+        return None
+    return os.path.join(jobs_folder, f"{job_id}.prof")
+
+
+def read_job(jobs_folder, job_id):
+    """
+    Returns the status record of a job, or None if the job is unknown.
+    """
+    if not JOB_ID_PATTERN.fullmatch(str(job_id)):
+        return None
+    try:
+        with open(_job_path(jobs_folder, job_id), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _owner_path(jobs_folder, owner):
+    return os.path.join(jobs_folder, OWNERS_FOLDER, f"{owner}.lock")
+
+
+def owner_alive(jobs_folder, owner):
+    """
+    Whether the job queue `owner` (see JobQueue.owner) still runs in some process.
+    """
+    if fcntl is None or not owner or not JOB_ID_PATTERN.fullmatch(str(owner)):
+        return False
+    path = _owner_path(jobs_folder, owner)
+    try:
+        lock = open(path, 'r')
+    except FileNotFoundError:
+        return False
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+    # Nobody holds it: its process exited
+    os.remove(path)
+    return False
+
+
+def write_job(jobs_folder, job_id, job):
+    # Status files are shared by every gunicorn worker and pool process, so write
+    # to a temporary file and rename it to never expose a half-written record
+    job['updated_at'] = time.time()
+    path = _job_path(jobs_folder, job_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+class JobProgress:
+    """
+    Records the status and per-stage progress of one job in its status file.
+    Instances are picklable and are handed to the pipeline running in the pool.
+    """
+    def __init__(self, jobs_folder, job_id):
+        self.jobs_folder = jobs_folder
+        self.job_id = job_id
+        self.job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'stage': None,
+            'stages': {},
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+        }
+
+    def _save(self):
+        write_job(self.jobs_folder, self.job_id, self.job)
+
+    def start(self):
+        self.job['status'] = 'running'
+        self.job['started_at'] = time.time()
+        self._save()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a pipeline stage and records the peak memory it reached. Yields a
+        dict of metrics, such as output sizes, the stage can fill in to have them
+        recorded next to its duration.
+        """
+        self.job['stage'] = name
+        self.job['stages'][name] = {'status': 'running'}
+        self._save()
+        stats = {}
+        metrics.reset_peak_rss()
+        children_peak = metrics.children_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield stats
+        except Exception as e:
+            status = 'suspended' if isinstance(e, JobSuspended) else 'failed'
+            self.job['stages'][name].update(stats, status=status, seconds=round(time.perf_counter() - start, 3))
+            raise
+        seconds = time.perf_counter() - start
+        self.job['stages'][name].update(stats, status='done', seconds=round(seconds, 3),
+                                        peak_rss_bytes=metrics.peak_rss())
+        if metrics.children_peak_rss() > children_peak:
+            # A pool process of this stage (page extraction, batch files) peaked higher than any before
+            self.job['stages'][name]['children_peak_rss_bytes'] = metrics.children_peak_rss()
+        self._save()
+        metrics.observe('pipeline_stage_seconds', seconds, stage=name)
+
+    def track_files(self, names):
+        """
+        Starts recording the status of every file of a batch job, in order.
+        """
+        self.job['files'] = [{'name': name, 'status': 'queued'} for name in names]
+        self._save()
+
+    def update_file(self, index, **info):
+        self.job['files'][index].update(info)
+        self._save()
+
+    def save_profile(self, profiler):
+        """
+        Dumps the cProfile statistics of the job next to its status file.
+        """
+        profiler.dump_stats(profile_path(self.jobs_folder, self.job_id))
+        self.job['profiled'] = True
+        self._save()
+
+    def finish(self, result):
+        self.job.update(status='done', stage=None, result=result, finished_at=time.time())
+        self._save()
+
+    def fail(self, error):
+        self.job.update(status='failed', error=error, finished_at=time.time())
+        self._save()
+
+    def suspend(self):
+        # Queued again by the job queue; the stages record how far it got
+        self.job.update(status='suspended', suspensions=self.job.get('suspensions', 0) + 1)
+        self._save()
+
+
+class JobQueue:
+    """
+    Bounded queue of background jobs executed by a local process pool.
+    """
+    def __init__(self, jobs_folder, max_workers=None, max_pending=32):
+        self.jobs_folder = jobs_folder
+        self.max_workers = max_workers or min(4, available_cpus())
+        self.max_pending = max_pending
+        self._executor = None
+        self._owner = None
+        self._owner_lock = None
+        self._pending = 0
+        self._active = {}   # key -> id of the unfinished job submitted with it
+        self._keys = {}     # job id -> its key
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily so that each gunicorn worker starts its own pool after forking
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                 initargs=(max(1, available_cpus() // self.max_workers),))
+        return self._executor
+
+    @property
+    def owner(self):
+        """
+        Id of this queue, recorded in the jobs it runs. The queue holds a lock
+        file named after it for as long as its process lives (see owner_alive).
+        """
+        with self._lock:
+            if self._owner is None:
+                # Created lazily too, so that a preloading master holds no lock its workers inherit
+                owner = uuid.uuid4().hex
+                path = _owner_path(self.jobs_folder, owner)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                lock = open(path, 'w')
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                self._owner, self._owner_lock = owner, lock
+            return self._owner
+
+    def submit(self, target, *args, job_id=None, key=None):
+        """
+        Queues `target(progress, *args)` and returns the new job id. With a
+        `job_id`, runs that job again under its existing status record. Raises
+        DuplicateJobError if a job with the same `key` (e.g. the digest of the
+        PDF it processes) is still queued or running.
+        """
+        resumed, job_id = job_id, job_id or uuid.uuid4().hex
+        with self._lock:
+            if key is not None and key in self._active:
+                raise DuplicateJobError(self._active[key])
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending jobs)")
+            self._pending += 1
+            if key is not None:
+                self._active[key] = job_id
+                self._keys[job_id] = key
+
+        try:
+            progress = JobProgress(self.jobs_folder, job_id)
+            if resumed is not None:
+                progress.job = read_job(self.jobs_folder, job_id) or progress.job
+                progress.job.update(status='queued', error=None)
+            progress.job['owner'] = self.owner
+            os.makedirs(self.jobs_folder, exist_ok=True)
+            progress._save()
+            self._run(progress, target, args)
+        except Exception:
+            self._finished(job_id)
+            raise
+        return progress.job_id
+
+    def _finished(self, job_id):
+        with self._lock:
+            self._pending -= 1
+            self._active.pop(self._keys.pop(job_id, None), None)
+
+    def active_job(self, key):
+        """
+        Id of the unfinished job this queue runs for `key`, or None.
+        """
+        with self._lock:
+            return self._active.get(key)
+
+    def _run(self, progress, target, args):
+        with self._lock:
+            executor = self._get_executor()
+            future = executor.submit(target, progress, *args)
+        future.add_done_callback(lambda f: self._on_done(progress, f, target, args, executor))
+
+    def _on_done(self, progress, future, target, args, executor):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # Every job of the broken pool fails with it; the first to notice replaces it
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+
+        requeue = isinstance(error, JobSuspended)
+        if requeue:
+            print(f"Job {progress.job_id} suspended: {str(error)}")
+            progress.job = self.get(progress.job_id) or progress.job
+        elif isinstance(error, BrokenProcessPool):
+            progress.job = self.get(progress.job_id) or progress.job
+            restarts = progress.job.get('restarts', 0)
+            requeue = restarts < MAX_JOB_RESTARTS
+            if requeue:
+                print(f"Job {progress.job_id} interrupted, restarting: {str(error)}")
+                progress.job.update(status='queued', restarts=restarts + 1)
+                progress._save()
+        if requeue:
+            # Queued again behind the jobs that arrived meanwhile, still counted as pending
+            try:
+                self._run(progress, target, args)
+                return
+            except Exception as e:
+                error = e
+
+        self._finished(progress.job_id)
+        if error is None:
+            return
+        # The pipeline records its own failures; this only catches crashed pool processes
+        print(f"Job {progress.job_id} crashed: {str(error)}")
+        progress.job = self.get(progress.job_id) or progress.job
+        progress.fail(str(error) or type(error).__name__)
+
+    def get(self, job_id):
+        return read_job(self.jobs_folder, job_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,251 @@
+import os
+import copy
+import json
+import time
+import uuid
+import resource
+import threading
+from contextlib import contextmanager
+
+
+# Every gunicorn worker and pool process keeps its own metrics and writes them to
+# a file of its own in this folder; /metrics adds up the files of all processes
+METRICS_FOLDER = os.environ.get('METRICS_FOLDER', 'metrics')
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+BYTES_BUCKETS = tuple(2 ** power * 1024 ** 2 for power in range(4, 14))  # 16 MiB to 8 GiB
+
+# Name: (type, help, buckets)
+METRICS = {
+    'http_request_seconds': ('histogram', 'Time spent answering HTTP requests', SECONDS_BUCKETS),
+    'pipeline_stage_seconds': ('histogram', 'Duration of each processing stage', SECONDS_BUCKETS),
+    'pdf_page_extract_seconds': ('histogram', 'Table extraction time of a single PDF page', SECONDS_BUCKETS),
+    'pdf_pages': ('histogram', 'Pages per processed PDF', COUNT_BUCKETS),
+    'pdf_rows': ('histogram', 'Transaction rows per processed case', COUNT_BUCKETS),
+    'graph_nodes': ('histogram', 'Accounts in the graph of a processed case', COUNT_BUCKETS),
+    'graph_edges': ('histogram', 'Transactions in the graph of a processed case', COUNT_BUCKETS),
+    'job_peak_rss_bytes': ('histogram', 'Peak resident memory of a job, of the process running it (process="self") '
+                           'and of the largest of its child processes (process="children")', BYTES_BUCKETS),
+    'pdf_pages_skipped_total': ('counter', 'Pages skipped by the table pre-screen', None),
+    'pdf_pages_cached_total': ('counter', 'Pages whose tables were reused from the page cache', None),
+    'jobs_total': ('counter', 'Finished jobs by outcome', None),
+    'transaction_dates_total': ('counter', 'Distinct transaction dates parsed by each format; rows left unparsed as format="none"', None),
+}
+
+
+class Registry:
+    """
+    The metrics of one process: histogram and counter series keyed by name and labels.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.pid = os.getpid()
+        self.path = os.path.join(folder, f"{self.pid}-{uuid.uuid4().hex}.json")
+        self.series = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def _series(self, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        series = self.series.get(key)
+        if series is None:
+            kind, _, buckets = METRICS[name]
+            if kind == 'histogram':
+                series = {'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            else:
+                series = {'value': 0.0}
+            self.series[key] = series
+        return series
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        with self.lock:
+            series = self._series(name, labels)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+            self.dirty = True
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self._series(name, labels)['value'] += value
+            self.dirty = True
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            records = [[name, list(labels), series] for (name, labels), series in self.series.items()]
+            self.dirty = False
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self.path)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def registry():
+    global _registry
+    # A forked process starts over with a file of its own
+    with _registry_lock:
+        if _registry is None or _registry.pid != os.getpid():
+            _registry = Registry(METRICS_FOLDER)
+        return _registry
+
+
+def observe(name, value, **labels):
+    registry().observe(name, value, **labels)
+
+
+def inc(name, value=1, **labels):
+    registry().inc(name, value, **labels)
+
+
+def flush():
+    registry().flush()
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def reset_peak_rss():
+    """
+    Resets the peak resident memory of this process, where the kernel allows it,
+    so that peak_rss() reports the peak of the work that follows.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    Peak resident memory of this process in bytes, since the last reset_peak_rss().
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def children_peak_rss():
+    """
+    Peak resident memory of the largest child process this process has waited
+    for, in bytes. It is never reset: a stage only knows the peak of its own
+    children when it rose while the stage ran.
+    """
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def remove_process(folder, pid):
+    """
+    Removes the metrics files of an exited process, whose counters would
+    otherwise be added up forever.
+    """
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        if name.startswith(f"{pid}-"):
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass
+
+
+def remove_dead(folder):
+    """
+    Removes the metrics files of every process that no longer runs. Returns
+    the number of processes whose files were removed.
+    """
+    if not os.path.isdir(folder):
+        return 0
+    dead = set()
+    for name in os.listdir(folder):
+        pid = name.split('-', 1)[0]
+        if not pid.isdigit() or pid in dead:
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            dead.add(pid)
+        except PermissionError:
+            pass  # Alive, run by another user
+    for pid in dead:
+        remove_process(folder, pid)
+    return len(dead)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def render(folder=METRICS_FOLDER):
+    """
+    Adds up the metrics files of every process and returns them in the
+    Prometheus text exposition format.
+    """
+    merged = {}
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(folder, name)) as f:
+                    records = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            for metric, labels, series in records:
+                if metric not in METRICS:
+                    continue
+                key = (metric, tuple(tuple(label) for label in labels))
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = copy.deepcopy(series)
+                elif 'value' in series:
+                    total['value'] += series['value']
+                else:
+                    total['counts'] = [a + b for a, b in zip(total['counts'], series['counts'])]
+                    total['sum'] += series['sum']
+                    total['count'] += series['count']
+
+    lines = []
+    for metric, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (name, labels), series in sorted(merged.items()):
+            if name != metric:
+                continue
+            if kind == 'counter':
+                lines.append(f"{metric}{_format_labels(labels)} {series['value']}")
+                continue
+            for bound, count in zip(buckets, series['counts']):
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {series['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {series['count']}")
+    return '\n'.join(lines) + '\n'
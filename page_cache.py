@@ -0,0 +1,96 @@
+import os
+import json
+import uuid
+import hashlib
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import PSLiteral
+
+
+# Part of every fingerprint: bump it when table extraction changes so that
+# cached pages are extracted again
+CACHE_VERSION = b'page-tables-1'
+
+# Stream attributes that only describe how the bytes are stored
+STORAGE_ATTRS = ('Length', 'Filter', 'DecodeParms')
+
+# Resources nest fonts, descriptors and form XObjects; deeper objects are not followed
+MAX_DEPTH = 16
+
+
+class PageCache:
+    """
+    Extracted tables of PDF pages, keyed by a fingerprint of everything that
+    determines them: the page's content streams, its resources (fonts, form
+    XObjects) and its geometry. A case PDF re-issued with more layers appended
+    only extracts its new or changed pages. One instance serves one open document.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        # Resolved resources shared by the pages of the document, by object id
+        self.memo = {}
+
+    def _canonical(self, obj, depth=0):
+        if depth > MAX_DEPTH:
+            return b'~'
+        if isinstance(obj, PDFObjRef):
+            if obj.objid not in self.memo:
+                self.memo[obj.objid] = b'~'  # Guards against reference cycles
+                self.memo[obj.objid] = self._canonical(obj.resolve(), depth + 1)
+            return self.memo[obj.objid]
+        if isinstance(obj, PDFStream):
+            attrs = {key: value for key, value in obj.attrs.items() if key not in STORAGE_ATTRS}
+            return b'stream:' + hashlib.sha256(self._canonical(attrs, depth + 1) + obj.get_data()).digest()
+        if isinstance(obj, dict):
+            items = sorted(obj.items(), key=lambda item: str(item[0]))
+            return b'{' + b','.join(repr(key).encode() + b':' + self._canonical(value, depth + 1)
+                                    for key, value in items) + b'}'
+        if isinstance(obj, (list, tuple)):
+            return b'[' + b','.join(self._canonical(value, depth + 1) for value in obj) + b']'
+        if isinstance(obj, PSLiteral):
+            return b'/' + repr(obj.name).encode()
+        return repr(obj).encode()
+
+    def fingerprint(self, page, content):
+        """
+        Fingerprint of a page whose decoded content streams are `content`,
+        or None if its resources cannot be read.
+        """
+        page_obj = page.page_obj
+        try:
+            resources = self._canonical(page_obj.resources)
+        except Exception:
+            return None
+        geometry = repr((page_obj.mediabox, page_obj.cropbox, page_obj.rotate)).encode()
+        digest = hashlib.sha256(CACHE_VERSION)
+        for part in (geometry, resources, content):
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, fingerprint):
+        return os.path.join(self.folder, f"{fingerprint}.json")
+
+    def load(self, fingerprint):
+        """
+        Returns the cached tables of a page, or None on a miss.
+        """
+        path = self._path(fingerprint)
+        try:
+            with open(path, 'r') as f:
+                tables = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # The mtime is the page's last use, for the age-based cleanup
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return tables
+
+    def store(self, fingerprint, tables):
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(fingerprint)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(tables, f)
+        os.replace(tmp_path, path)
@@ -1,224 +1,472 @@
+import os
+import time
 import pdfplumber
 import pandas as pd
 import re
-
-
-# Function to process the PDF
-def process_pdf(pdf_path):
-        expected_keywords = [
-            "s. no.", "account no.", "action taken", "bank", "account details",
-            "transaction details", "branch", "manager", "reference no.", "atm id",
-            "place", "location", "action taken by", "date of action"
-        ]
-        all_data = []
-        headers = None
-        table_found = False
-
-        with pdfplumber.open(pdf_path) as pdf:
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdfminer.pdftypes import resolve1
+from extraction_profiles import PROFILES, DEFAULT_PROFILE, match_profile
+from page_cache import PageCache
+from checkpoints import TimeBudgetExceeded
+from job_queue import worker_cpus
+
+
+# Extracted tables of every page seen, by page fingerprint, so that a re-issued
+# case PDF only extracts its new or changed pages; empty to disable
+PAGE_CACHE_FOLDER = os.environ.get('PAGE_CACHE_FOLDER', 'page_cache')
+
+# Documents shorter than this are extracted serially, a pool costs more than it saves
+PARALLEL_MIN_PAGES = 16
+
+# Raw table rows parsed together; only one chunk of raw rows is held at a time
+CHUNK_ROWS = 5000
+
+# Path construction (m, re) and form XObject (Do) operators of a page content stream.
+# Tables are found from ruling lines, so a page without any of them has no table.
+RULING_OPERATOR_PATTERN = re.compile(rb'(?<![^\s\])>])(?:re|m|Do)(?![^\s\[(<>/])')
+
+
+def _page_content(page):
+    # Decoded content streams of a page, or None if they cannot be read
+    try:
+        return b''.join(resolve1(stream).get_data() for stream in page.page_obj.contents)
+    except Exception:
+        return None
+
+
+def page_may_have_tables(page, content=None):
+    """
+    Cheap pre-screen run before table extraction: scans the page's raw content
+    stream for drawing operators instead of laying out every character. Pages
+    it rules out (cover letters, annexure text, signature pages) cannot yield
+    a table; anything it cannot read is extracted as usual.
+    """
+    if content is None:
+        content = _page_content(page)
+    return content is None or RULING_OPERATOR_PATTERN.search(content) is not None
+
+
+def _page_tables(page, stats, cache=None):
+    stats['pages'] = stats.get('pages', 0) + 1
+    content = _page_content(page)
+    if not page_may_have_tables(page, content):
+        stats['skipped_pages'] = stats.get('skipped_pages', 0) + 1
+        return []
+
+    fingerprint = None
+    if cache is not None and content is not None:
+        fingerprint = cache.fingerprint(page, content)
+        tables = cache.load(fingerprint) if fingerprint is not None else None
+        if tables is not None:
+            stats['cached_pages'] = stats.get('cached_pages', 0) + 1
+            return tables
+
+    start = time.perf_counter()
+    tables = page.extract_tables()
+    # Drop the parsed layout objects pdfplumber caches on the page
+    page.close()
+    stats.setdefault('page_seconds', []).append(time.perf_counter() - start)
+    if fingerprint is not None:
+        cache.store(fingerprint, tables)
+    return tables
+
+
+def _merge_stats(stats, other):
+    for key, value in other.items():
+        if isinstance(value, list):
+            stats.setdefault(key, []).extend(value)
+        else:
+            stats[key] = stats.get(key, 0) + value
+
+
+def _extract_page_range(pdf_path, start, stop, page_cache):
+    # Runs in a pool worker: each worker opens its own handle on the PDF
+    stats = {}
+    cache = PageCache(page_cache) if page_cache else None
+    with pdfplumber.open(pdf_path) as pdf:
+        page_tables = [_page_tables(page, stats, cache) for page in pdf.pages[start:stop]]
+        return page_tables, stats
+
+
+def extract_page_tables(pdf_path, workers=None, stats=None, page_cache=None):
+    """
+    Yields the tables of every page, in page order. With more than one worker,
+    page ranges are extracted in parallel across a process pool. Pages without
+    ruling lines are skipped, and with a `page_cache` folder, pages extracted
+    before are read from it. If given, `stats` counts the pages seen, skipped and
+    cached, and receives the time spent opening the PDF and extracting each page.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('pages', 0)
+    stats.setdefault('skipped_pages', 0)
+    stats.setdefault('cached_pages', 0)
+
+    start = time.perf_counter()
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        stats['open_seconds'] = time.perf_counter() - start
+        if workers is None:
+            workers = worker_cpus() if page_count >= PARALLEL_MIN_PAGES else 1
+
+        if workers <= 1 or page_count < 2:
+            cache = PageCache(page_cache) if page_cache else None
             for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    if not table_found:
-                        if table and len(table) > 1:
-                            potential_headers = [str(cell).strip().lower() for cell in table[0] if cell is not None]
-                            keyword_matches = sum(any(keyword in header for header in potential_headers)
-                                                for keyword in expected_keywords)
-                            if keyword_matches >= 8:
-                                headers = table[0]
-                                data = table[1:]
-                                all_data.extend(data)
-                                table_found = True
-                    else:
-                        if table and len(table) > 0:
-                            first_row = [str(cell).strip().lower() for cell in table[0] if cell is not None]
-                            if all(header.lower() in first_row for header in headers if header):
-                                data = table[1:]
-                            else:
-                                data = table
-                            all_data.extend(data)
-
-        if table_found and all_data:
-            df = pd.DataFrame(all_data, columns=headers)
-            # Assuming df is already your DataFrame and column 4 is the bank column
-            bank_col = df.columns[3]  # Adjust index if needed
-
-            if bank_col in df.columns:
-                  df['Extracted Bank Name'] = (
-                                      df[bank_col]
-                                      .astype(str)
-                                      .str.split('\n')  # Split into list of lines
-                                      .str[:2]          # Take first two lines
-                                      .str.join('\n')    # Rejoin with newline (optional)
-                                      )
-            # Keywords to check (case-insensitive)
-            KEYWORDS = {'bank', 'ltd', 'limited'}
-            def process_lines(text):
-                lines = str(text).split('\n')  # Split into lines
-                first_line = lines[0].strip()  # Keep first line
-
-                # Check remaining lines for keywords
-                for line in lines[1:]:
-                    line_lower = line.lower()
-                    if any(keyword in line_lower for keyword in KEYWORDS):
-                        first_line += " " + line.strip()  # Append if keyword found
-
-                return first_line
-            # Apply to DataFrame
-            df['Processed_Bank_Name'] = df['Extracted Bank Name'].apply(process_lines)
-
-            third_col = df.columns[2]  # assuming third column exists
-            if third_col in df.columns:
-                # Clean and normalize the third column: remove newlines and trim spaces
-                df[third_col] = df[third_col].astype(str).str.replace('\n', ' ', regex=False).str.strip()
-
-                # Extract text before "Txn Date:" or "Date:"
-                def extract_before_date(text):
-                    text = text.replace('\n', ' ').strip()
-                    match_txn = re.split(r'Txn Date:', text, flags=re.IGNORECASE)
-                    if len(match_txn) > 1:
-                        return match_txn[0].strip()
-                    match_date = re.split(r'Date:', text, flags=re.IGNORECASE)
-                    if len(match_date) > 1:
-                        return match_date[0].strip()
-                    return text  # fallback if neither is found
-
-                df['Transaction status'] = df[third_col].apply(extract_before_date)
-
-                # Extract cheque number
-                df['Cheque No'] = df[third_col].apply(
-                  lambda x: re.search(r'Cheque\s*No\s*[:\-]?\s*(\d+)', x, re.IGNORECASE).group(1)
-                  if re.search(r'Cheque\s*No\s*[:\-]?\s*(\d+)', x, re.IGNORECASE) else None
-                )
-                # Extract Transaction Date (Txn Date: or Date:)
-                def extract_txn_date(text):
-                    text = text.replace('\n', ' ').strip()
-                    match_txn = re.search(r'Txn Date:\s*([\d:/\sAPMapm]+)', text)
-                    if match_txn:
-                        return match_txn.group(1).strip()
-                    match_date = re.search(r'Date:\s*([\d:/\sAPMapm]+)', text)
-                    if match_date:
-                        return match_date.group(1).strip()
-                    return None
-
-                df['Transaction Date'] = df[third_col].apply(extract_txn_date)
-
-                # Drop the original third column
-                df = df.drop(columns=[third_col])
-
-            if len(df.columns) >= 2:
-                second_col = df.columns[1]
-
-                # Extract account number logic
-                def extract_account_number(text):
-                    lines = str(text).strip().split('\n')
-                    if len(lines) < 2:
-                        return lines[0]  # Only one line exists
-
-                    line1 = lines[0]
-                    line2 = lines[1]
-
-                    # Condition 1: Non-digit characters in line2 → return line1 only
-                    if not re.fullmatch(r'\d+', line2.strip()):
-                        return line1
-
-                    # Condition 2: Digits in line2 (check count)
-                    if len(line2.strip()) <= 7:
-                        return line1 + line2  # Combine if ≤7 digits
+                yield _page_tables(page, stats, cache)
+            return
+
+    # Several ranges per worker so that slow pages do not leave the others idle
+    range_size = max(1, -(-page_count // (workers * 4)))
+    starts = list(range(0, page_count, range_size))
+    stops = [min(start + range_size, page_count) for start in starts]
+
+    # Ranges are submitted a few at a time, so that the tables of ranges finished
+    # ahead of the one being consumed never pile up
+    with ProcessPoolExecutor(max_workers=min(workers, len(starts))) as executor:
+        in_flight = deque()
+        ranges = iter(zip(starts, stops))
+        for first, stop in itertools.islice(ranges, workers * 2):
+            in_flight.append(executor.submit(_extract_page_range, pdf_path, first, stop, page_cache))
+        while in_flight:
+            page_tables, range_stats = in_flight.popleft().result()
+            for first, stop in itertools.islice(ranges, 1):
+                in_flight.append(executor.submit(_extract_page_range, pdf_path, first, stop, page_cache))
+            _merge_stats(stats, range_stats)
+            yield from page_tables
+            del page_tables
+
+
+def _chunk_stats(stats):
+    # Counts persisted with a chunk; page times are only reported by the run that measured them
+    return {key: value for key, value in stats.items() if not isinstance(value, list)}
+
+
+def extract_to_checkpoint(pdf_path, checkpoint, workers=None, stats=None, page_cache=None, deadline=None):
+    """
+    Extracts the tables of every page into `checkpoint`, one chunk of pages at
+    a time, skipping the chunks an earlier run completed. Raises
+    TimeBudgetExceeded once time.time() passes `deadline` with chunks left;
+    the completed ones are kept. Returns the number of pages. `stats` is filled
+    in as by extract_page_tables, with the pages of earlier runs as checkpointed_pages.
+    """
+    if stats is None:
+        stats = {}
+    for key in ('pages', 'skipped_pages', 'cached_pages', 'checkpointed_pages'):
+        stats.setdefault(key, 0)
+
+    start = time.perf_counter()
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    stats['open_seconds'] = time.perf_counter() - start
+
+    done = checkpoint.completed()
+    todo = []
+    for page_range in checkpoint.ranges(page_count):
+        if page_range in done:
+            _merge_stats(stats, checkpoint.read_chunk(*page_range)[1])
+            stats['checkpointed_pages'] += page_range[1] - page_range[0]
+        else:
+            todo.append(page_range)
+    if workers is None:
+        workers = worker_cpus() if page_count - stats['checkpointed_pages'] >= PARALLEL_MIN_PAGES else 1
+
+    def out_of_time():
+        return deadline is not None and time.time() >= deadline
+
+    if workers <= 1 or not todo:
+        for index, (first, stop) in enumerate(todo):
+            page_tables, range_stats = _extract_page_range(pdf_path, first, stop, page_cache)
+            checkpoint.write_chunk(first, stop, page_tables, _chunk_stats(range_stats))
+            _merge_stats(stats, range_stats)
+            if out_of_time() and index < len(todo) - 1:
+                raise TimeBudgetExceeded(f"Extracted {stop} of {page_count} pages")
+        return page_count
+
+    # Several ranges per worker as in extract_page_tables, cut within the chunks; a
+    # chunk is written once all of its ranges are extracted
+    range_size = max(1, -(-sum(stop - first for first, stop in todo) // (workers * 4)))
+    parts = {}
+    chunk_stats = {}
+    futures = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_start, chunk_stop in todo:
+            starts = range(chunk_start, chunk_stop, range_size)
+            parts[chunk_start, chunk_stop] = [None] * len(starts)
+            chunk_stats[chunk_start, chunk_stop] = {}
+            for index, first in enumerate(starts):
+                future = executor.submit(_extract_page_range, pdf_path, first, min(first + range_size, chunk_stop),
+                                         page_cache)
+                futures[future] = ((chunk_start, chunk_stop), index)
+
+        remaining = len(todo)
+        for future in as_completed(futures):
+            chunk, index = futures[future]
+            page_tables, range_stats = future.result()
+            parts[chunk][index] = page_tables
+            _merge_stats(stats, range_stats)
+            _merge_stats(chunk_stats[chunk], range_stats)
+            if any(part is None for part in parts[chunk]):
+                continue
+            checkpoint.write_chunk(*chunk, [tables for part in parts.pop(chunk) for tables in part],
+                                   _chunk_stats(chunk_stats.pop(chunk)))
+            remaining -= 1
+            if remaining and out_of_time():
+                # Ranges being extracted are lost, the others were never started
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise TimeBudgetExceeded(f"Extracted {len(todo) - remaining} of {len(todo)} remaining chunks "
+                                         f"of {page_count} pages")
+    return page_count
+
+
+def iter_table_rows(page_tables, profiles=PROFILES):
+    """
+    Finds the transaction table header of any of the extraction `profiles` and
+    yields `(headers, rows)` for every page from there on, where rows are the data
+    rows of that page's tables.
+    """
+    headers = None
+    table_found = False
+
+    for tables in page_tables:
+        page_data = []
+        for table in tables:
+            if not table_found:
+                if table and len(table) > 1:
+                    if match_profile(table[0], profiles) is not None:
+                        headers = table[0]
+                        data = table[1:]
+                        page_data.extend(data)
+                        table_found = True
+            else:
+                if table and len(table) > 0:
+                    first_row = [str(cell).strip().lower() for cell in table[0] if cell is not None]
+                    if all(header.lower() in first_row for header in headers if header):
+                        data = table[1:]
                     else:
-                        return line1  # Discard if >7 digits
-
-                df['Second Col Account Number'] = df[second_col].apply(extract_account_number)
-
-                # Extract the transaction ID (after the second '\n')
-                df['Second Col Transaction ID'] = df[second_col].astype(str).str.strip().str.split('\n').str[2:]
-
-                # Join the parts after the second '\n' if there are multiple parts
-                df['Second Col Transaction ID'] = df['Second Col Transaction ID'].apply(lambda x: ''.join(x) if isinstance(x, list) else x)
+                        data = table
+                    page_data.extend(data)
+
+        if table_found:
+            yield headers, page_data
+
+
+def _as_text(values):
+    # Same text the row-wise code got from str(x), including 'None'/'nan' for empty cells
+    return values.astype(object).map(str)
+
+
+def _split_lines(text, count):
+    # The first `count` lines of every value as columns, missing where a value has fewer lines
+    lines = text.str.split('\n', n=count, expand=True)
+    # A column no value reaches is all NaN, which would be typed as float
+    return lines.reindex(columns=range(count)).astype(object)
+
+
+def _like_apply(values):
+    # Give a vectorized result the dtype and missing values of the equivalent
+    # row-wise .apply that returned None for non-matches
+    values = values.astype(object)
+    return values.where(values.notna(), None).infer_objects()
+
+
+def parse_columns(df, profile=DEFAULT_PROFILE):
+    """
+    Splits the raw multi-line table cells into the derived account, bank, and transaction
+    columns, finding the columns and fields with the given extraction profile.
+    """
+    patterns = profile.patterns
+    bank_col = profile.column(df, 'bank')
+    third_col = profile.column(df, 'status')
+    second_col = profile.column(df, 'account')
+
+    if bank_col is not None:
+        df['Extracted Bank Name'] = (
+                            df[bank_col]
+                            .astype(str)
+                            .str.split('\n')  # Split into list of lines
+                            .str[:2]          # Take first two lines
+                            .str.join('\n')    # Rejoin with newline (optional)
+                            )
+
+    # Keep the first line and append the second one if it continues the bank name
+    bank_lines = _split_lines(_as_text(df['Extracted Bank Name']), 2)
+    first_line = bank_lines[0].str.strip()
+    second_line = bank_lines[1]
+    continues_name = second_line.str.lower().str.contains(patterns['bank_name_keywords']).fillna(False).astype(bool)
+    df['Processed_Bank_Name'] = _like_apply(
+        first_line.where(~continues_name, first_line + " " + second_line.str.strip())
+    )
+
+    if third_col is not None:
+        # Clean and normalize the third column: remove newlines and trim spaces
+        df[third_col] = df[third_col].astype(str).str.replace('\n', ' ', regex=False).str.strip()
+
+        # Extract text before "Txn Date:" or "Date:"
+        before_date = df[third_col].str.extract(patterns['before_date'])
+        df['Transaction status'] = _like_apply(
+            before_date[0].fillna(before_date[1]).str.strip().fillna(df[third_col])
+        )
+
+        # Extract cheque number
+        df['Cheque No'] = _like_apply(df[third_col].str.extract(patterns['cheque_no'])[0])
+
+        # Extract Transaction Date (Txn Date: or Date:)
+        txn_date = df[third_col].str.extract(patterns['txn_date'])
+        df['Transaction Date'] = _like_apply(txn_date[0].fillna(txn_date[1]).str.strip())
+
+        # Drop the original third column
+        df = df.drop(columns=[third_col])
+
+    if second_col is not None:
+        # Extract account number: the first line, plus the second one when it is a
+        # short (≤7 digit) continuation of the number
+        account_lines = _split_lines(_as_text(df[second_col]).str.strip(), 2)
+        line1 = account_lines[0]
+        line2 = account_lines[1]
+        line2_digits = line2.str.strip()
+        is_continuation = (
+            line2_digits.str.fullmatch(patterns['digits']).fillna(False).astype(bool)
+            & (line2_digits.str.len() <= 7)
+        )
+        df['Second Col Account Number'] = _like_apply(line1.where(~is_continuation, line1 + line2))
+
+        # Extract the transaction ID (after the second '\n') and join the remaining parts
+        df['Second Col Transaction ID'] = df[second_col].astype(str).str.strip().str.split('\n').str[2:].str.join('')
+
+        # Extract the Layer number using a regular expression
+        df['Layer'] = df['Second Col Transaction ID'].str.extract(patterns['layer']).astype(float).astype(pd.Int64Dtype())
+
+        # Remove the 'Layer : <number>' part from the Transaction ID
+        df['Second Col Transaction ID'] = df['Second Col Transaction ID'].str.split('Layer :', n=1).str[0].str.strip()
+
+        # Drop the original second column
+        df = df.drop(columns=[second_col])
+
+    combined_col = profile.column(df, 'account_details')
+    if combined_col is not None:
+        account_details = _as_text(df[combined_col])
+
+        # Everything before the "ifsc" keyword, or the first two lines if it is missing
+        before_ifsc = account_details.str.extract(patterns['before_ifsc'])[0]
+        detail_lines = _split_lines(account_details, 2)
+        first_two_lines = detail_lines[0] + detail_lines[1].fillna('')
+        truncated = before_ifsc.fillna(first_two_lines).str.strip().str.replace('\n', '', regex=False)
+
+        # The account number follows the 9-character label
+        df['Account Number'] = _like_apply(truncated.str[9:].where(truncated.str.len() > 9))
+
+        # Extract IFSC Code
+        df['IFSC Code'] = _like_apply(account_details.str.extract(patterns['ifsc'])[0])
+
+        # Extract the Reported Count using a specific regex pattern
+        df['Reported Count'] = _like_apply(account_details.str.extract(patterns['reported_count'])[0])
+
+        # Create the combined report column
+        has_details = df['Account Number'].notna() | df['IFSC Code'].notna() | df['Reported Count'].notna()
+        report = (
+            "Account: " + _as_text(df['Account Number'])
+            + " - IFSC: " + _as_text(df['IFSC Code'])
+            + " - Reported: " + _as_text(df['Reported Count']) + " times"
+        )
+        df['Account Details Report'] = _like_apply(report.where(has_details, df[combined_col].astype(object)))
+
+        # Drop the original combined column
+        df = df.drop(columns=[combined_col])
+
+    transactional_col = profile.column(df, 'transaction_details')
+    if transactional_col is not None:
+        # Preprocess the combined_col to handle multi-line strings
+        df[transactional_col] = df[transactional_col].str.replace('\n', ' ').str.strip()
+        df['Transaction ID / UTR Number'] = _like_apply(df[transactional_col].str.extract(patterns['transaction_id'])[0])
+        df['Transaction Amount'] = _like_apply(df[transactional_col].str.extract(patterns['transaction_amount'])[0])
+        df['Disputed Amount'] = _like_apply(df[transactional_col].str.extract(patterns['disputed_amount'])[0])
+        df['Transaction Amount'] = pd.to_numeric(df['Transaction Amount'], errors='coerce')
+        df['Disputed Amount'] = pd.to_numeric(df['Disputed Amount'], errors='coerce')
+        df = df.drop(columns=[transactional_col])
+
+    return df
 
-                # Extract the Layer number using a regular expression
-                df['Layer'] = df['Second Col Transaction ID'].str.extract(r'Layer : (\d+)').astype(float).astype(pd.Int64Dtype())
 
-                # Remove the 'Layer : <number>' part from the Transaction ID
-                df['Second Col Transaction ID'] = df['Second Col Transaction ID'].str.split('Layer :').str[0].str.strip()
-
-                # Drop the original second column and the temporary 'Name' column
-                df = df.drop(columns=[second_col])
-                # df = df.drop(columns=[second_col])
-            combined_col = "Account Details"
-            # Assuming `df` is already defined and `combined_col` contains the raw account details
-            if combined_col in df.columns:
-                # Define patterns for Account Number and IFSC Code
-                # account_pattern = r'\b\d{10,20}\b'
-                ifsc_pattern = r'\b[A-Z]{4}\d[A-Z0-9]{6}\b'
-
-                ifsc_keyword_pattern = r'\bifsc\b'  # Case-insensitive "ifsc" keyword
-
-                def extract_data(text):
-                    text = str(text)
-
-                    # Check if "ifsc" keyword exists (case-insensitive)
-                    ifsc_keyword_match = re.search(ifsc_keyword_pattern, text, flags=re.IGNORECASE)
-
-                    if ifsc_keyword_match:
-                        # Extract everything before "ifsc" keyword
-                        truncated = text[:ifsc_keyword_match.start()].strip()
-                    else:
-                        # Fallback: Extract up to second newline
-                        lines = text.split('\n')
-                        truncated = ''.join(lines[:2]).strip()
-
-                    return truncated
-
-                # Apply extraction logic
-                df['Truncated Data'] = df[combined_col].apply(extract_data)
-                # After extracting the truncated data
-                df['Truncated Data'] = df['Truncated Data'].str.replace('\n', '', regex=False)
-
-                # Extract all numeric sequences from the truncated data
-                df['Account Number'] = df['Truncated Data'].apply(
-                  lambda x: str(x)[9:] if pd.notna(x) and len(str(x)) > 9 else None
-                )
-                # Extract IFSC Code
-                df['IFSC Code'] = df[combined_col].apply(
-                    lambda x: re.search(ifsc_pattern, str(x)).group() if re.search(ifsc_pattern, str(x)) else None
-                )
-
-                # Extract the Reported Count using a specific regex pattern
-                reported_pattern = r'Reported (\d+) times'
-                df['Reported Count'] = df[combined_col].apply(
-                    lambda x: re.search(reported_pattern, str(x)).group(1) if re.search(reported_pattern, str(x)) else None
-                )
-
-                # Create the combined report column
-                df['Account Details Report'] = df.apply(
-                    lambda row: f"Account: {row['Account Number']} - IFSC: {row['IFSC Code']} - Reported: {row['Reported Count']} times"
-                                if pd.notna(row['Account Number']) or pd.notna(row['IFSC Code']) or pd.notna(row['Reported Count'])
-                                else row[combined_col],
-                    axis=1
-                )
-
-                # Drop the original combined column
-                df = df.drop(columns=[combined_col,'Truncated Data'])
-            transactional_col = "Transaction Details"
-            if transactional_col in df.columns:
-                # Preprocess the combined_col to handle multi-line strings
-                df[transactional_col] = df[transactional_col].str.replace('\n', ' ').str.strip()
-                transaction_id_pattern =  r'Transaction ID / UTR\s+Number-:\s*([A-Z]*\d+)'
-                transaction_amount_pattern = r'Transaction Amount-:\s*(\d+(?:\.\d+)?)'
-                disputed_amount_pattern = r'Disputed Amount:\s*(\d+(?:\.\d+)?)'
-                df['Transaction ID / UTR Number'] = df[transactional_col].apply(
-                    lambda x: re.search(transaction_id_pattern, str(x)).group(1) if re.search(transaction_id_pattern, str(x)) else None
-                )
-                df['Transaction Amount'] = df[transactional_col].apply(
-                    lambda x: re.search(transaction_amount_pattern, str(x)).group(1) if re.search(transaction_amount_pattern, str(x)) else None
-                )
-                df['Disputed Amount'] = df[transactional_col].apply(
-                    lambda x: re.search(disputed_amount_pattern, str(x)).group(1) if re.search(disputed_amount_pattern, str(x)) else None
-                )
-                df['Transaction Amount'] = pd.to_numeric(df['Transaction Amount'], errors='coerce')
-                df['Disputed Amount'] = pd.to_numeric(df['Disputed Amount'], errors='coerce')
-                df = df.drop(columns=[transactional_col])
-
-            return df
-        else:
-            return None
\ No newline at end of file
+# Function to process the PDF
+def process_pdf(pdf_path, workers=None, stats=None, page_cache=PAGE_CACHE_FOLDER, checkpoint=None, deadline=None):
+    if stats is None:
+        stats = {}
+    name = os.path.basename(pdf_path)
+    if checkpoint is None:
+        page_tables = extract_page_tables(pdf_path, workers, stats, page_cache)
+    else:
+        name = checkpoint.filename or name
+        # Pages are spilled to the checkpoint as they are extracted, then read back in order
+        page_count = extract_to_checkpoint(pdf_path, checkpoint, workers, stats, page_cache, deadline)
+        page_tables = checkpoint.iter_pages(page_count)
+        if stats['checkpointed_pages']:
+            print(f"Resumed {stats['checkpointed_pages']} of {page_count} pages from the checkpoint of {name}")
+    # Raw rows are parsed a chunk at a time, so only the typed columns grow with the document
+    chunks = list(iter_parsed_chunks(page_tables, stats=stats))
+    print(f"Skipped {stats['skipped_pages']} of {stats['pages']} pages without tables in {name}, "
+          f"reused {stats['cached_pages']} unchanged pages")
+
+    if not chunks:
+        return None
+    return concat_chunks(chunks)
+
+
+def iter_process_pdf(pdf_path, chunk_rows=CHUNK_ROWS, workers=None, stats=None, page_cache=PAGE_CACHE_FOLDER):
+    """
+    Streaming variant of process_pdf: yields the parsed rows as DataFrame chunks of
+    about `chunk_rows` rows, cut at page boundaries, instead of building one frame
+    for the whole document. The chunk indexes continue across chunks.
+    """
+    return iter_parsed_chunks(extract_page_tables(pdf_path, workers, stats, page_cache), chunk_rows, stats)
+
+
+def iter_parsed_chunks(page_tables, chunk_rows=CHUNK_ROWS, stats=None):
+    """
+    Finds the transaction table in the tables of every page and yields its rows
+    parsed as DataFrame chunks of about `chunk_rows` rows, cut at page
+    boundaries. The layout is recognised by the table's header row.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('parse_seconds', 0)
+    buffered = []
+    offset = 0
+    headers = None
+    profile = None
+
+    for headers, rows in iter_table_rows(page_tables):
+        if profile is None:
+            profile = match_profile(headers)
+        buffered.extend(rows)
+        if len(buffered) >= chunk_rows:
+            yield _parse_chunk(buffered, headers, offset, profile, stats)
+            offset += len(buffered)
+            buffered = []
+
+    if buffered:
+        yield _parse_chunk(buffered, headers, offset, profile, stats)
+
+
+def concat_chunks(chunks):
+    """
+    Joins parsed chunks into the frame process_pdf would have parsed at once.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    df = pd.concat(chunks)
+    for column in df.columns:
+        # A column empty in some chunk was inferred as object there, not as text
+        if len({chunk[column].dtype for chunk in chunks}) > 1:
+            df[column] = df[column].infer_objects()
+    return df
+
+
+def _parse_chunk(rows, headers, offset, profile, stats):
+    start = time.perf_counter()
+    df = pd.DataFrame(rows, columns=headers)
+    df.index = pd.RangeIndex(offset, offset + len(rows))
+    df = parse_columns(df, profile)
+    stats['parse_seconds'] += time.perf_counter() - start
+    return df
@@ -0,0 +1,347 @@
+import os
+import time
+import shutil
+import cProfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import result_cache
+import exporters
+import graph_renderer
+import graph_store
+import metrics
+import transactions
+import dates
+from job_queue import JobSuspended, worker_cpus
+from checkpoints import Checkpoint, CheckpointBusyError
+from anomalies import count_flags
+from edge_index import EdgeIndex
+from graph_builder import build_graph
+
+
+# Exports written while processing; the other formats are produced on first download
+DEFAULT_EXPORTS = ('json',)
+
+# Column recording which PDF of a batch a merged record came from
+SOURCE_COLUMN = 'Source File'
+
+# Records of a batch are de-duplicated on this column
+UTR_COLUMN = 'Transaction ID / UTR Number'
+
+# Exported column with the duplicate, split and burst flags of every record
+FLAGS_COLUMN = 'Transaction Flags'
+
+
+def _generate(progress, generate, work_dir, profile):
+    if not profile:
+        return generate(work_dir)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(generate, work_dir)
+    finally:
+        progress.save_profile(profiler)
+
+
+def _publish(progress, processed_folder, digest, filename, uploads, generate, profile=False):
+    # Runs `generate(work_dir)`, publishes the artifacts it returns as the cache entry
+    # of `digest`, and records the outcome in the job status and metrics
+    progress.start()
+    metrics.reset_peak_rss()
+    work_dir = result_cache.begin_entry(processed_folder, digest)
+    result = error = None
+    try:
+        artifacts = _generate(progress, generate, work_dir, profile)
+        if artifacts is not None:
+            result = result_cache.commit_entry(processed_folder, digest, work_dir, filename, artifacts)
+    except JobSuspended:
+        # The job queue runs it again; the uploads stay in its checkpoint
+        progress.suspend()
+        raise
+    except Exception as e:
+        print(f"Error processing {filename}: {str(e)}")
+        error = str(e)
+    finally:
+        # The uploads are only needed until their outputs are cached
+        for filepath in uploads:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if error is None and result is None:
+        error = 'Failed to process the PDF file'
+
+    # Every stage restarts the peak, so the job's is the highest of its stages
+    stages = progress.job['stages'].values()
+    peak_rss = max([metrics.peak_rss()] + [stage.get('peak_rss_bytes', 0) for stage in stages])
+    progress.job['peak_rss_bytes'] = peak_rss
+    metrics.observe('job_peak_rss_bytes', peak_rss, process='self')
+    children_peak = max(stage.get('children_peak_rss_bytes', 0) for stage in stages) if stages else 0
+    if children_peak:
+        progress.job['children_peak_rss_bytes'] = children_peak
+        metrics.observe('job_peak_rss_bytes', children_peak, process='children')
+    metrics.inc('jobs_total', outcome='failed' if error else 'done')
+    metrics.flush()
+
+    if error is not None:
+        progress.fail(error)
+        return None
+
+    progress.finish(result)
+    return result
+
+
+def _record_pdf_stats(stats):
+    # Page times only feed the histogram; the job status keeps the totals
+    page_seconds = stats.pop('page_seconds', [])
+    for seconds in page_seconds:
+        metrics.observe('pdf_page_extract_seconds', seconds)
+    stats['extract_seconds'] = sum(page_seconds)
+
+    for key, stage in (('open_seconds', 'pdf_open'), ('extract_seconds', 'table_extraction'),
+                       ('parse_seconds', 'column_parsing')):
+        if key in stats:
+            metrics.observe('pipeline_stage_seconds', stats[key], stage=stage)
+            stats[key] = round(stats[key], 3)
+    metrics.observe('pdf_pages', stats.get('pages', 0))
+    metrics.inc('pdf_pages_skipped_total', stats.get('skipped_pages', 0))
+    metrics.inc('pdf_pages_cached_total', stats.get('cached_pages', 0))
+
+
+def _record_date_stats(stats):
+    for date_format, count in stats.get('parsed', {}).items():
+        metrics.inc('transaction_dates_total', count, format=date_format)
+    metrics.inc('transaction_dates_total', stats.get('unparsed', 0), format='none')
+
+
+def run_pipeline(progress, process_pdf, filepath, processed_folder, digest, filename, exports=DEFAULT_EXPORTS,
+                 render_html=True, graph_db=None, profile=False, checkpoint_folder=None, time_budget=None):
+    """
+    Runs the processing pipeline for one uploaded PDF inside a job worker, publishes
+    the outputs as the cache entry of the PDF's digest, and records the outcome in
+    the job status. With a `graph_db`, the case's transactions are added to the
+    cross-case graph store. With `profile`, the job is run under cProfile.
+
+    With a `checkpoint_folder`, extracted pages are checkpointed so that a job
+    that is interrupted, or that runs longer than `time_budget` seconds, is
+    suspended and continues from its last completed chunk of pages.
+    """
+    if checkpoint_folder is None:
+        def generate(work_dir):
+            return generate_outputs(progress, process_pdf, filepath, work_dir, filename, exports, render_html,
+                                    graph_db, digest)
+
+        return _publish(progress, processed_folder, digest, filename, [filepath], generate, profile)
+
+    checkpoint = Checkpoint(checkpoint_folder, digest)
+    try:
+        checkpoint.acquire()
+    except CheckpointBusyError:
+        # Another job is processing the same PDF: wait for it and reuse its outputs,
+        # or take over its checkpoint if it failed or was suspended
+        print(f"Waiting for the job already processing {filename}")
+        progress.start()
+        checkpoint.acquire(wait=True)
+
+    cached = result_cache.lookup(processed_folder, digest)
+    if cached is not None:
+        checkpoint.remove()
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        progress.finish(cached)
+        return cached
+
+    try:
+        source = checkpoint.adopt(filepath, {
+            'job_id': progress.job_id,
+            'owner': progress.job.get('owner'),
+            'filename': filename,
+            'exports': list(exports),
+            'render_html': render_html,
+            'graph_db': graph_db,
+        })
+        deadline = time.time() + time_budget if time_budget else None
+
+        def generate(work_dir):
+            return generate_outputs(progress, process_pdf, source, work_dir, filename, exports, render_html,
+                                    graph_db, digest, checkpoint=checkpoint, deadline=deadline)
+
+        return _publish(progress, processed_folder, digest, filename, [], generate, profile)
+    finally:
+        # A suspended job keeps its checkpoint for the run that continues it
+        if progress.job['status'] == 'suspended':
+            checkpoint.release()
+        else:
+            checkpoint.remove()
+
+
+def run_batch_pipeline(progress, process_pdf, files, processed_folder, digest, name, exports=DEFAULT_EXPORTS,
+                       render_html=True, graph_db=None, profile=False, workers=None):
+    """
+    Runs the pipeline for a batch of PDFs belonging to one case. `files` lists the
+    (name, digest, path) of every upload. The PDFs are processed concurrently,
+    their records merged and de-duplicated by UTR, and the outputs of the combined
+    case published as the cache entry of the batch `digest`.
+    """
+    def generate(work_dir):
+        with progress.stage('process_pdf') as stats:
+            frames = process_batch(progress, process_pdf, files, processed_folder, workers)
+            stats['files'] = len(frames)
+        if not frames:
+            return None
+
+        with progress.stage('merge') as stats:
+            df, duplicates = merge_records(frames)
+            stats.update(rows=len(df), duplicates=duplicates)
+
+        return write_outputs(progress, df, work_dir, name, exports, render_html, graph_db, digest,
+                             members=[file_digest for _, file_digest, _ in files])
+
+    return _publish(progress, processed_folder, digest, name, [path for _, _, path in files], generate, profile)
+
+
+def _process_file(process_pdf, filepath):
+    start = time.perf_counter()
+    stats = {}
+    # The batch already runs one file per core, so pages are not split any further
+    df = process_pdf(filepath, workers=1, stats=stats)
+    return df, dict(stats, seconds=time.perf_counter() - start)
+
+
+def _load_cached(processed_folder, digest):
+    # Records of a PDF that was already processed on its own
+    if result_cache.lookup(processed_folder, digest) is None:
+        return None
+    try:
+        return exporters.load_snapshot(os.path.join(processed_folder, digest))
+    except FileNotFoundError:
+        return None
+
+
+def process_batch(progress, process_pdf, files, processed_folder, workers=None):
+    """
+    Processes the PDFs of a batch across a process pool, recording the status and
+    timing of every file in the job status. Returns the records of the files that
+    could be processed, in upload order, each tagged with its source file.
+    """
+    progress.track_files([name for name, _, _ in files])
+    frames = []
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers or min(len(files), worker_cpus())) as executor:
+        for index, (name, digest, filepath) in enumerate(files):
+            cached = _load_cached(processed_folder, digest)
+            if cached is not None:
+                frames.append((index, cached))
+                progress.update_file(index, status='done', cached=True, rows=len(cached), seconds=0)
+                continue
+            pending[executor.submit(_process_file, process_pdf, filepath)] = index
+
+        for future in as_completed(pending):
+            index = pending[future]
+            try:
+                df, stats = future.result()
+            except Exception as e:
+                print(f"Error processing {files[index][0]}: {str(e)}")
+                progress.update_file(index, status='failed', error=str(e))
+                continue
+            _record_pdf_stats(stats)
+            stats['seconds'] = round(stats['seconds'], 3)
+            if df is None:
+                progress.update_file(index, status='failed', error='Failed to process the PDF file', **stats)
+                continue
+            frames.append((index, df))
+            progress.update_file(index, status='done', cached=False, rows=len(df), **stats)
+
+    return [df.assign(**{SOURCE_COLUMN: files[index][0]}) for index, df in sorted(frames, key=lambda frame: frame[0])]
+
+
+def merge_records(frames):
+    """
+    Combines the records of a batch, keeping the first record of every UTR number.
+    Records without a UTR are all kept. Returns the merged DataFrame and the number
+    of duplicates dropped.
+    """
+    df = pd.concat(frames, ignore_index=True)
+    if UTR_COLUMN not in df.columns:
+        return df, 0
+    duplicated = df[UTR_COLUMN].notna() & df.duplicated(subset=UTR_COLUMN)
+    return df[~duplicated].reset_index(drop=True), int(duplicated.sum())
+
+
+def generate_outputs(progress, process_pdf, filepath, output_folder, filename, exports=DEFAULT_EXPORTS,
+                     render_html=True, graph_db=None, digest=None, checkpoint=None, deadline=None):
+    """
+    Processes an uploaded PDF and writes its outputs to `output_folder`.
+    Returns the names of all artifacts, or None if the PDF could not be processed.
+    Page extraction is checkpointed and bounded by `deadline` if a `checkpoint` is given.
+    """
+    options = {} if checkpoint is None else {'checkpoint': checkpoint, 'deadline': deadline}
+
+    # Process the uploaded PDF
+    # Records the pages seen and skipped by the table pre-screen
+    with progress.stage('process_pdf') as stats:
+        try:
+            df = process_pdf(filepath, stats=stats, **options)
+        finally:
+            _record_pdf_stats(stats)
+    if df is None:
+        return None
+
+    return write_outputs(progress, df, output_folder, filename, exports, render_html, graph_db, digest)
+
+
+def write_outputs(progress, df, output_folder, filename, exports=DEFAULT_EXPORTS, render_html=True,
+                  graph_db=None, digest=None, members=()):
+    """
+    Generates the requested exports and the graph data of processed records in
+    `output_folder`, along with the snapshot the remaining exports are produced from.
+    The graph page is rendered too unless `render_html` is False, in which case it is
+    rendered from the graph data on first download. Returns the names of all artifacts.
+    `members` are the digests of the PDFs of a batch, for the graph store.
+    """
+    stem = os.path.splitext(filename)[0]
+    artifacts = exporters.export_names(stem)
+    artifacts['graph'] = stem + '_graph.html'
+    artifacts['graph_data'] = stem + '_graph.json'
+
+    # Timestamps of the raw transaction dates, for sorting and time windows
+    with progress.stage('dates') as stats:
+        df = dates.with_timestamps(df, stats)
+    _record_date_stats(stats)
+
+    # The typed table the graph, the store and graph queries work from
+    with progress.stage('transactions') as stats:
+        table = transactions.from_frame(df)
+        transactions.write_transactions(table, output_folder)
+        stats['bytes'] = int(table.memory_usage(deep=True).sum())
+        stats['flags'] = count_flags(table['flags'])
+    metrics.observe('pdf_rows', len(df))
+
+    # Sorted date and amount indexes, for filtered graph views
+    with progress.stage('edge_index'):
+        EdgeIndex.build(table).write(output_folder)
+
+    # Exports (and the snapshot they are produced from) carry the flags too
+    df = df.assign(**{FLAGS_COLUMN: table['flags'].astype(object).to_numpy()})
+    with progress.stage('snapshot'):
+        exporters.write_snapshot(df, output_folder)
+
+    for kind in exports:
+        with progress.stage(kind):
+            exporters.write_export(df, os.path.join(output_folder, artifacts[kind]), kind)
+
+    with progress.stage('graph') as stats:
+        G = build_graph(table)
+        document, size = graph_renderer.write_graph_data(
+            graph_renderer.graph_data(G), os.path.join(output_folder, artifacts['graph_data']))
+        stats.update(nodes=G.number_of_nodes(), edges=G.number_of_edges(), bytes=size)
+    metrics.observe('graph_nodes', stats['nodes'])
+    metrics.observe('graph_edges', stats['edges'])
+
+    if render_html:
+        with progress.stage('render') as stats:
+            stats['bytes'] = graph_renderer.render_html(document, os.path.join(output_folder, artifacts['graph']))
+
+    if graph_db is not None:
+        with progress.stage('store') as stats:
+            stats['transactions'] = graph_store.upsert_case(graph_db, digest, filename, table, members)
+
+    return artifacts
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from werkzeug.security import safe_join
+
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = 'manifest.json'
+
+# Suffixes of the precompressed variants of artifacts (see downloads.ENCODINGS)
+VARIANT_SUFFIXES = ('.gz', '.br')
+
+# Default size limit of one uploaded PDF
+MAX_UPLOAD_BYTES = 256 * 1024 * 1024
+
+# A PDF starts with this marker within its first kilobyte
+PDF_MAGIC = b'%PDF-'
+PDF_MAGIC_WINDOW = 1024
+
+
+class InvalidUploadError(ValueError):
+    """Raised when an uploaded file is not a PDF."""
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the size limit."""
+
+
+def save_upload(file, upload_folder, filename, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Streams an uploaded file to disk while hashing it.
+    Returns the SHA-256 hex digest of its bytes and the saved path.
+    """
+    return save_stream(file.stream, upload_folder, filename, max_bytes)
+
+
+def _check_pdf(head, filename):
+    if PDF_MAGIC not in head[:PDF_MAGIC_WINDOW]:
+        raise InvalidUploadError(f"{filename} is not a PDF file")
+
+
+def save_stream(stream, upload_folder, filename, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Copies a PDF to disk in chunks while hashing it. The upload is rejected as
+    soon as it grows past `max_bytes` or its first kilobyte lacks the PDF header,
+    and the partial file removed.
+    """
+    digest = hashlib.sha256()
+    filepath = os.path.join(upload_folder, f"{uuid.uuid4().hex}_{filename}")
+    size = 0
+    head = b''
+    try:
+        with open(filepath, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLargeError(f"{filename} exceeds the upload limit of {max_bytes // 1024 ** 2} MiB")
+                if head is not None:
+                    head += chunk
+                    if len(head) >= PDF_MAGIC_WINDOW:
+                        _check_pdf(head, filename)
+                        head = None
+                digest.update(chunk)
+                f.write(chunk)
+        if head is not None:
+            _check_pdf(head, filename)
+    except Exception:
+        os.remove(filepath)
+        raise
+    return digest.hexdigest(), filepath
+
+
+# Download route and response key of every artifact kind
+ARTIFACT_URLS = {
+    'excel': ('/download-excel', 'excel_download_url'),
+    'json': ('/download-json', 'json_download_url'),
+    'csv': ('/download-csv', 'csv_download_url'),
+    'parquet': ('/download-parquet', 'parquet_download_url'),
+    'arrow': ('/download-arrow', 'arrow_download_url'),
+    'graph': ('/download-graph', 'graph_html_url'),
+    'graph_data': ('/download-graph-data', 'graph_data_url'),
+}
+
+
+def result_urls(digest, artifacts):
+    urls = {
+        key: f"{route}?filename={digest}/{artifacts[kind]}"
+        for kind, (route, key) in ARTIFACT_URLS.items()
+        if kind in artifacts
+    }
+    # Subgraphs of the entry are queried by digest
+    urls['graph_query_url'] = f"/graph/{digest}"
+    return urls
+
+
+def batch_digest(digests):
+    """
+    Cache key of a batch of PDFs: the same files give the same key in any order.
+    """
+    return hashlib.sha256(("batch:" + ",".join(sorted(digests))).encode()).hexdigest()
+
+
+def _touch(entry_dir):
+    # The manifest's mtime is the entry's last access time for LRU eviction
+    try:
+        os.utime(os.path.join(entry_dir, MANIFEST_NAME))
+    except FileNotFoundError:
+        pass
+
+
+def read_manifest(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, MANIFEST_NAME), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def lookup(processed_folder, digest):
+    """
+    Returns the cached result URLs for a PDF digest, or None on a miss.
+    """
+    entry_dir = os.path.join(processed_folder, digest)
+    manifest = read_manifest(entry_dir)
+    if manifest is None:
+        return None
+    _touch(entry_dir)
+    return result_urls(digest, manifest['artifacts'])
+
+
+def begin_entry(processed_folder, digest):
+    """
+    Creates the private working folder the pipeline writes a new entry's artifacts to.
+    """
+    work_dir = os.path.join(processed_folder, f"{digest}.{uuid.uuid4().hex}.tmp")
+    os.makedirs(work_dir)
+    return work_dir
+
+
+def commit_entry(processed_folder, digest, work_dir, filename, artifacts):
+    """
+    Publishes a finished working folder as the cache entry of `digest` and returns its URLs.
+    If a concurrent upload of the same PDF got there first, its entry is kept.
+    """
+    manifest = {'digest': digest, 'filename': filename, 'artifacts': artifacts, 'created_at': time.time()}
+    with open(os.path.join(work_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+
+    entry_dir = os.path.join(processed_folder, digest)
+    try:
+        os.rename(work_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        cached = lookup(processed_folder, digest)
+        if cached is not None:
+            return cached
+        raise
+    return result_urls(digest, artifacts)
+
+
+def resolve_download(processed_folder, filename):
+    """
+    Maps a download `filename` ("<digest>/<artifact>") to its path inside the cache,
+    refreshing the entry's access time. Only the artifacts listed in the entry's
+    manifest and their compressed variants are served; returns None for anything
+    else (snapshots, the manifest) and for artifacts that do not exist.
+    """
+    path = safe_join(processed_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    entry_dir, name = os.path.split(path)
+    manifest = read_manifest(entry_dir)
+    for suffix in VARIANT_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    if manifest is None or name not in manifest['artifacts'].values():
+        return None
+    _touch(entry_dir)
+    # send_file resolves relative paths against the app root, not the working directory
+    return os.path.abspath(path)
+
+
+def _folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict(processed_folder, max_bytes, max_age):
+    """
+    Removes entries not accessed for `max_age` seconds, then the least recently
+    used ones until the cache fits in `max_bytes`. Abandoned working folders
+    older than `max_age` are removed as well. Returns the number of entries removed.
+    """
+    if not os.path.isdir(processed_folder):
+        return 0
+
+    now = time.time()
+    entries = []
+    removed = 0
+    for name in os.listdir(processed_folder):
+        path = os.path.join(processed_folder, name)
+        if not os.path.isdir(path):
+            continue
+        try:
+            last_access = os.path.getmtime(os.path.join(path, MANIFEST_NAME))
+        except FileNotFoundError:
+            # Working folder of a running (or crashed) job
+            if now - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+
+        if now - last_access > max_age:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        else:
+            entries.append((last_access, _folder_size(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+
+    return removed
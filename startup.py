@@ -0,0 +1,96 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # No file locks (Windows): every process runs its own maintenance
+    fcntl = None
+
+
+# When the process started loading the app; startup.py is imported first
+LOAD_STARTED = time.perf_counter()
+
+# Seconds spent in each startup step of this process, in order
+TIMINGS = {}
+
+
+@contextmanager
+def step(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TIMINGS[name] = time.perf_counter() - start
+
+
+def record(name):
+    """
+    Records the time since the app started loading as startup step `name`.
+    """
+    TIMINGS[name] = time.perf_counter() - LOAD_STARTED - sum(TIMINGS.values())
+
+
+def warm_up():
+    """
+    Runs a two-transaction report through the table, graph and render code, so
+    that lazily imported modules and first-use caches are loaded before workers
+    fork rather than on their first upload.
+    """
+    import pandas as pd
+    import transactions
+    from graph_builder import build_graph
+    from graph_renderer import graph_data, dumps_graph_data
+    from flow_analytics import flow_summary
+
+    with step('warm_up'):
+        df = pd.DataFrame({
+            'Second Col Account Number': ['1000', '2000'],
+            'Account Number': ['2000', '3000'],
+            'IFSC Code': ['SBIN0000001', 'UTIB0000001'],
+            'Processed_Bank_Name': ['State Bank of India', 'Axis Bank'],
+            'Layer': [1, 2],
+            'Transaction Amount': ['100', '50'],
+            'Transaction Date': ['01/01/2024 10:00:00 AM', '01/01/2024'],
+        })
+        G = build_graph(transactions.from_frame(df))
+        dumps_graph_data(graph_data(G))
+        flow_summary(G)
+
+
+def report(name, since=None):
+    """
+    Prints how long startup took and what it spent it on. `since` is a
+    time.time() stamp, e.g. when a worker was forked.
+    """
+    steps = ', '.join(f"{step_name} {seconds:.3f}s" for step_name, seconds in TIMINGS.items())
+    ready = f" ready in {time.time() - since:.3f}s" if since is not None else " ready"
+    print(f"{name} (pid {os.getpid()}){ready}; app load: {steps or 'none'}")
+
+
+def start_maintenance(lock_path, interval, task, on_start=None):
+    """
+    Runs `task` every `interval` seconds in one process of the deployment.
+    Every process calling this starts a thread that waits for an exclusive lock
+    on `lock_path`; the process holding it runs the task, and when it exits,
+    the lock passes to one of the waiting processes. `on_start` is run once by
+    each process that takes the lock.
+    """
+    def run():
+        folder = os.path.dirname(lock_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            print(f"Process {os.getpid()} runs maintenance every {interval}s")
+            if on_start is not None:
+                on_start()
+            while True:
+                time.sleep(interval)
+                task()
+
+    thread = threading.Thread(target=run, name='maintenance', daemon=True)
+    thread.start()
+    return thread
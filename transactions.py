@@ -0,0 +1,140 @@
+import os
+import pandas as pd
+import dates
+from bank_index import BANK_INDEX
+from anomalies import flag_transactions
+
+
+class SchemaError(Exception):
+    """Raised when a transaction table does not match TRANSACTION_SCHEMA."""
+
+
+# File of the transaction table in a cache entry
+TRANSACTIONS_NAME = 'transactions.pkl'
+
+# The compact, typed model of extracted transactions: one row per transaction,
+# column -> (column of the processed DataFrame it is read from, kind)
+TRANSACTION_SCHEMA = {
+    'parent': ('Second Col Account Number', 'category'),
+    'child': ('Account Number', 'category'),
+    'ifsc': ('IFSC Code', 'category'),
+    'bank': ('Processed_Bank_Name', 'category'),
+    'layer': ('Layer', 'int16'),
+    'utr': ('Transaction ID / UTR Number', 'string'),
+    'amount': ('Transaction Amount', 'float64'),
+    'disputed': ('Disputed Amount', 'float64'),
+    'status': ('Transaction status', 'category'),
+    'cheque': ('Cheque No', 'string'),
+    'date': (dates.TIMESTAMP_COLUMN, 'datetime'),
+    # The date as printed in the report, for display
+    'date_text': ('Transaction Date', 'string'),
+    # Canonical bank (see bank_index.py) of the bank name, or else of the IFSC code
+    'bank_id': (None, 'category'),
+    # Duplicate, split and burst flags (see anomalies.py), comma-separated
+    'flags': (None, 'category'),
+}
+
+# dtype of every kind; text repeated across rows (accounts, banks, branches,
+# statuses) is stored once per distinct value
+KIND_DTYPES = {
+    'category': 'category',
+    'int16': 'Int16',
+    'float64': 'float64',
+    'string': 'string',
+    'datetime': 'datetime64[ns]',
+}
+
+# Columns holding accounts share one dictionary, so an account is stored once
+# however often it sends or receives money
+ACCOUNT_COLUMNS = ('parent', 'child')
+
+
+def _text(values):
+    # Cells as strings, with <NA> for missing ones
+    return values.astype('string')
+
+
+def _convert(values, kind):
+    if kind == 'category':
+        return _text(values).astype('category')
+    if kind == 'int16':
+        numbers = pd.to_numeric(values, errors='coerce')
+        if numbers.notna().any() and not numbers.dropna().between(-2 ** 15, 2 ** 15 - 1).all():
+            raise SchemaError("Layer numbers do not fit in int16")
+        return numbers.astype('Int16')
+    if kind == 'float64':
+        return pd.to_numeric(values, errors='coerce').astype('float64')
+    if kind == 'datetime':
+        return pd.to_datetime(values).astype('datetime64[ns]')
+    return _text(values).astype('string')
+
+
+def validate(table):
+    """
+    Checks that a transaction table has exactly the columns and dtypes of
+    TRANSACTION_SCHEMA. Raises SchemaError otherwise.
+    """
+    if list(table.columns) != list(TRANSACTION_SCHEMA):
+        raise SchemaError(f"Transaction columns {list(table.columns)} do not match the schema")
+    for name, (_, kind) in TRANSACTION_SCHEMA.items():
+        expected = KIND_DTYPES[kind]
+        if kind == 'category':
+            valid = isinstance(table[name].dtype, pd.CategoricalDtype)
+        elif kind == 'string':
+            valid = isinstance(table[name].dtype, pd.StringDtype)
+        else:
+            valid = table[name].dtype == expected
+        if not valid:
+            raise SchemaError(f"Transaction column {name} is {table[name].dtype}, expected {expected}")
+    return table
+
+
+def from_frame(df):
+    """
+    Builds the typed transaction table of a processed DataFrame, validated once.
+    Source columns the DataFrame lacks give missing values. The timestamps of the
+    normalization stage are reused; only frames without them, e.g. snapshots
+    written before it existed, have their raw dates parsed here.
+    """
+    if dates.TIMESTAMP_COLUMN not in df.columns:
+        df = dates.with_timestamps(df)
+    columns = {}
+    for name, (source, kind) in TRANSACTION_SCHEMA.items():
+        if source is None:
+            continue
+        values = df[source] if source in df.columns else pd.Series(None, index=df.index, dtype=object)
+        columns[name] = _convert(values, kind)
+    accounts = pd.api.types.union_categoricals([columns[name] for name in ACCOUNT_COLUMNS]).categories
+    for name in ACCOUNT_COLUMNS:
+        columns[name] = columns[name].cat.set_categories(accounts)
+
+    # Derived columns
+    columns['bank_id'] = _convert(BANK_INDEX.resolve_many(columns['bank'], columns['ifsc']), 'category')
+    flags = flag_transactions(columns['utr'], columns['parent'], columns['child'], columns['amount'], columns['date'])
+    columns['flags'] = _convert(flags, 'category')
+    return validate(pd.DataFrame(columns).reset_index(drop=True))
+
+
+def iter_rows(table, columns):
+    """
+    Iterates over the transactions as tuples of the given columns, with missing
+    values as None. Columns are converted once instead of looking up every cell.
+    """
+    lists = []
+    for name in columns:
+        column = table[name].astype(object)
+        lists.append(column.where(column.notna(), None).tolist())
+    return zip(*lists)
+
+
+def write_transactions(table, folder):
+    table.to_pickle(os.path.join(folder, TRANSACTIONS_NAME))
+
+
+def load_transactions(folder):
+    """
+    Loads the transaction table of a cache entry. Raises FileNotFoundError for
+    entries written before the table existed, and SchemaError for tables of an
+    older schema.
+    """
+    return validate(pd.read_pickle(os.path.join(folder, TRANSACTIONS_NAME)))